@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Export reminders in every format and import them back in another time zone
+
+Writes a one-off reminder and a repeating one that has already fired a few
+times with each of EXPORT_FORMATS, switches the local time zone, and reads
+the file back through IMPORT_FORMATS and normalize_reminder() as --import
+does. Trigger times, the start of the series and the occurrence count must
+all survive.
+
+Exits non-zero unless every format round-trips every field.
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import reminder_app
+
+FIELDS = ('title', 'message', 'trigger_time', 'triggered', 'recurrence', 'recurrence_start', 'occurrence')
+
+def set_time_zone(name):
+    os.environ['TZ'] = name
+    time.tzset()
+
+def sample_reminders():
+    # Whole seconds, since iCalendar has no finer resolution
+    now = int(time.time())
+    return [
+        {'id': 1, 'title': "Once", 'message': "with, a comma", 'trigger_time': float(now + 3600),
+         'triggered': False},
+        {'id': 2, 'title': "Standup", 'message': "", 'trigger_time': float(now + 86400 * 3),
+         'triggered': False, 'recurrence': "FREQ=DAILY", 'recurrence_start': float(now - 86400 * 4),
+         'occurrence': 8},
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder App export and import round trip")
+    parser.add_argument("--export-zone", default="America/New_York")
+    parser.add_argument("--import-zone", default="Asia/Tokyo")
+    args = parser.parse_args()
+
+    failed = False
+    for name, write in reminder_app.EXPORT_FORMATS.items():
+        set_time_zone(args.export_zone)
+        reminders = sample_reminders()
+        text = "".join(write(reminders))
+        set_time_zone(args.import_zone)
+        read = reminder_app.IMPORT_FORMATS[name]
+        imported = [reminder_app.normalize_reminder(record) for record in read(io.StringIO(text))]
+
+        problems = []
+        for original, copy in zip(reminders, imported):
+            for field in FIELDS:
+                if original.get(field) != copy.get(field):
+                    problems.append(f"{original['title']} {field} {original.get(field)!r} -> {copy.get(field)!r}")
+        if len(imported) != len(reminders):
+            problems.append(f"{len(imported)} of {len(reminders)} reminders read back")
+        failed = failed or bool(problems)
+        print(f"{name:<6} {'ok' if not problems else 'FAILED: ' + '; '.join(problems)}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
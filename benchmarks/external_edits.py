@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Edit reminders.json behind a running app and check what the merge keeps
+
+Each case starts the headless app from headless.py in a throwaway home
+directory, writes two reminders out to reminders.json, then adds a third
+that only the journal or the pending write-behind changes hold. An editor
+then rewrites the file as it finds it: one reminder renamed, one deleted
+and a new one added. After reload_external_changes() and a restart, the
+rename, deletion and addition must show, and the reminder added here must
+have survived, whichever conflict policy is in force. The sqlite backend
+has no file for other programs to edit and is left out.
+
+Exits non-zero unless every case keeps exactly the expected reminders.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+BACKENDS = (
+    # storage, write_delay; a long delay keeps the local addition in WriteBehindStore
+    ("journal", 0),
+    ("journal", 60),
+    ("json", 0),
+    ("json", 60),
+)
+
+def edit_file(path):
+    """Rename the first reminder, delete the second and add one, as an editor would"""
+    with open(path) as f:
+        records = json.load(f)
+    renamed, deleted = records[0], records[1]
+    renamed['title'] = "Renamed elsewhere"
+    records.remove(deleted)
+    added = {'id': max(r['id'] for r in records) + 100, 'title': "Added elsewhere", 'message': "",
+             'trigger_time': time.time() + 3600, 'triggered': False}
+    records.append(added)
+    # Make sure the signature differs even on a coarse clock
+    time.sleep(0.01)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(records, f)
+    os.replace(path + ".tmp", path)
+    return renamed['id'], deleted['id'], added['id']
+
+def run_case(reminder_app, App, storage, write_delay, policy):
+    os.environ['HOME'] = tempfile.mkdtemp(prefix="reminder-edits-")
+    app = App(storage=storage, write_delay=write_delay, on_conflict=policy)
+    due = time.time() + 3600
+    for title in ("Kept", "Deleted elsewhere"):
+        app.run_on_main_loop(app.add_reminder, title, "", due)
+    app.run_on_main_loop(app.save_reminders)
+    local = app.run_on_main_loop(app.add_reminder, "Added here", "", due)
+
+    path = app.run_on_main_loop(lambda: app.lists[reminder_app.ReminderList.DEFAULT].store.watched_path())
+    renamed, deleted, added = edit_file(path)
+    app.run_on_main_loop(app.reload_external_changes)
+    in_memory = app.run_on_main_loop(lambda: {r.id: r.title for r in app.reminders.values()})
+    app.run_on_main_loop(app.shutdown)
+
+    app = App(storage=storage, write_delay=write_delay, on_conflict=policy)
+    restarted = app.run_on_main_loop(lambda: {r.id: r.title for r in app.reminders.values()})
+    app.run_on_main_loop(app.shutdown)
+
+    expected = {renamed: "Renamed elsewhere", added: "Added elsewhere", local.id: "Added here"}
+    ok = in_memory == expected and restarted == expected
+    details = "" if ok else f" expected {expected}, merged {in_memory}, after restart {restarted}"
+    return ok, details
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder App merge of reminders.json edited elsewhere")
+    parser.parse_args()
+
+    from headless import HeadlessApp
+    import reminder_app
+
+    failed = False
+    for storage, write_delay in BACKENDS:
+        for policy in reminder_app.ReminderAppBase.CONFLICT_POLICIES:
+            ok, details = run_case(reminder_app, HeadlessApp, storage, write_delay, policy)
+            failed = failed or not ok
+            name = f"{storage}{' write-behind' if write_delay else ''}, {policy}"
+            print(f"{name:<30} {'ok' if ok else 'FAILED'}{details}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""ReminderAppBase without GTK, libnotify or D-Bus, for the benchmarks
+
+A plain thread stands in for the GLib main loop and notifications are
+recorded instead of shown. Import this before creating the app, after
+pointing HOME at a throwaway directory.
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+import collections
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import reminder_app
+
+class HeadlessApp(reminder_app.ReminderAppBase):
+    def __init__(self, **kwargs):
+        self.loop_queue = queue.SimpleQueue()
+        self.fired = collections.Counter()
+        self.fire_latency = []
+        self.early = []
+        self.loop_thread = threading.Thread(target=self.run_loop)
+        self.loop_thread.daemon = True
+        self.loop_thread.start()
+        super().__init__(**kwargs)
+    
+    def init_notifications(self):
+        pass
+    
+    def close_notifications(self):
+        pass
+    
+    def create_sleep_monitor(self):
+        return reminder_app.SleepMonitor(self.scheduler.resumed)
+    
+    def create_clock_monitor(self):
+        return reminder_app.ClockMonitor(self.scheduler.clock_changed)
+    
+    def create_file_watcher(self, path, on_change):
+        return reminder_app.FileWatcher(path, on_change, self.call_later)
+    
+    def call_soon(self, func, *args):
+        self.loop_queue.put((func, args))
+    
+    def call_later(self, delay, func, *args):
+        timer = threading.Timer(delay, self.call_soon, (func,) + args)
+        timer.daemon = True
+        timer.start()
+    
+    def run_loop(self):
+        while True:
+            func, args = self.loop_queue.get()
+            func(*args)
+    
+    def trigger_notification(self, reminder):
+        """Record when the reminder reached the notification stage"""
+        now = time.time()
+        self.fired[reminder['id']] += 1
+        self.fire_latency.append(now - float(reminder['trigger_time']))
+        if now < float(reminder['trigger_time']):
+            self.early.append(reminder['id'])
+        self.notification_delivered((reminder['id'],))
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""Drive the snooze, done, dismiss and escalation paths of notifications
+
+A fake notification daemon stands in for libnotify: show_notification()
+creates and shows notifications on it as usual, and each case then presses
+a button or closes the notification the way the daemon would, through
+on_notification_action() and on_notification_closed(). Every case runs the
+headless app from headless.py in a throwaway home directory, with
+escalation delays shortened to fractions of a second.
+
+Exits non-zero unless every case behaves as the readme describes.
+"""
+
+import os
+import sys
+import time
+import types
+import argparse
+import tempfile
+
+class FakeNotification:
+    """One notification on the fake daemon, with the calls libnotify's has"""
+
+    server = None
+
+    @classmethod
+    def new(cls, summary, body, icon):
+        return cls(summary, body)
+
+    def __init__(self, summary, body):
+        self.summary = summary
+        self.body = body
+        self.actions = {}
+        self.handlers = {}
+        self.closed_reason = -1
+
+    def update(self, summary, body, icon):
+        self.summary = summary
+        self.body = body
+        return True
+
+    def set_urgency(self, urgency):
+        pass
+
+    def connect(self, signal, callback):
+        self.handlers[signal] = callback
+
+    def clear_actions(self):
+        self.actions = {}
+
+    def add_action(self, action, label, callback, user_data):
+        self.actions[action] = (callback, user_data)
+
+    def show(self):
+        self.closed_reason = -1
+        self.server.shown.append(self)
+        return True
+
+    def get_closed_reason(self):
+        return self.closed_reason
+
+    def press(self, action):
+        """The user clicked a button; the daemon then closes the notification"""
+        callback, user_data = self.actions[action]
+        callback(self, action, user_data)
+        self.close(2)
+
+    def close(self, reason):
+        """Closed for reason: 1 expired, 2 dismissed by the user"""
+        self.closed_reason = reason
+        self.handlers["closed"](self)
+
+class FakeNotifyServer:
+    """Stands in for the Notify module, recording every notification shown"""
+
+    Notification = FakeNotification
+
+    class Urgency:
+        NORMAL = 1
+
+    def __init__(self):
+        FakeNotification.server = self
+        self.caps = ["actions", "body"]
+        self.shown = []
+
+    def init(self, name):
+        return True
+
+    def uninit(self):
+        pass
+
+    def get_server_caps(self):
+        return list(self.caps)
+
+def install_fake_gi(server):
+    """Have require_gi() import the fake daemon instead of libnotify"""
+    gi = types.ModuleType("gi")
+    gi.require_version = lambda namespace, version: None
+    repository = types.ModuleType("gi.repository")
+    repository.Notify = server
+    repository.GLib = repository.Gio = None
+    gi.repository = repository
+    sys.modules["gi"] = gi
+    sys.modules["gi.repository"] = repository
+
+def make_app_class(reminder_app, HeadlessApp):
+    class App(HeadlessApp):
+        # Notify through the dispatcher and show_notification like the real app
+        init_notifications = reminder_app.ReminderAppBase.init_notifications
+        close_notifications = reminder_app.ReminderAppBase.close_notifications
+        trigger_notification = reminder_app.ReminderAppBase.trigger_notification
+    return App
+
+class Case:
+    """One scenario: a fresh home directory, app and reminder due shortly"""
+
+    ESCALATION = (0.4, 0.4)
+
+    def __init__(self, App, server, recurrence=None, actions=True):
+        os.environ['HOME'] = tempfile.mkdtemp(prefix="reminder-actions-")
+        server.caps = ["actions", "body"] if actions else ["body"]
+        server.shown = []
+        self.App = App
+        self.server = server
+        self.app = self.start()
+        self.reminder = self.app.run_on_main_loop(
+            self.app.add_reminder, "Call back", "", time.time() + 0.2, recurrence
+        )
+        self.wait_for_shown(1)
+
+    def start(self):
+        return self.App(notify_options={'window': 0, 'rate': 0}, escalation=self.ESCALATION, write_delay=0)
+
+    def wait_for_shown(self, count, timeout=5):
+        deadline = time.time() + timeout
+        while len(self.server.shown) < count and time.time() < deadline:
+            time.sleep(0.02)
+        return len(self.server.shown) >= count
+
+    def shown(self):
+        return len(self.server.shown)
+
+    def notification(self):
+        return self.server.shown[-1]
+
+    def press(self, action):
+        self.app.run_on_main_loop(self.notification().press, action)
+
+    def close(self, reason):
+        self.app.run_on_main_loop(self.notification().close, reason)
+
+    def after_escalations(self):
+        """Wait until every escalation still scheduled would have shown"""
+        time.sleep(sum(self.ESCALATION) + 0.4)
+
+    def restart(self):
+        """Shut down and start again over the same files, returning the reminder record as reloaded"""
+        self.finish()
+        self.app = self.start()
+        for reminder in self.app.run_on_main_loop(lambda: list(self.app.iter_reminders())):
+            if reminder['id'] == self.reminder.id:
+                return reminder
+        return None
+
+    def finish(self):
+        self.app.run_on_main_loop(self.app.shutdown)
+        # The loop thread outlives the app; stop it running escalations like a quit GLib loop would
+        self.app.call_soon = lambda func, *args: None
+
+def case_escalation(case):
+    case.after_escalations()
+    return case.shown() == 1 + len(case.ESCALATION) and case.reminder.get('unacknowledged') == 3, \
+        f"shown {case.shown()} times, unacknowledged {case.reminder.get('unacknowledged')}"
+
+def case_buttons(case):
+    actions = tuple(case.notification().actions)
+    expected = tuple(action for action, label in case.app.NOTIFICATION_ACTIONS)
+    return actions == expected, f"buttons {actions}"
+
+def case_done(case):
+    case.press("done")
+    case.after_escalations()
+    return case.shown() == 1 and 'unacknowledged' not in case.reminder and case.reminder.triggered, \
+        f"shown {case.shown()} times, unacknowledged {case.reminder.get('unacknowledged')}"
+
+def case_dismiss(case):
+    case.close(2)
+    case.after_escalations()
+    return case.shown() == 1 and 'unacknowledged' not in case.reminder, \
+        f"shown {case.shown()} times, unacknowledged {case.reminder.get('unacknowledged')}"
+
+def case_expire(case):
+    # Expiring unseen is not dismissing, so escalation goes on
+    case.close(1)
+    case.after_escalations()
+    return case.shown() == 1 + len(case.ESCALATION), f"shown {case.shown()} times"
+
+def case_snooze(case):
+    case.press("snooze-15")
+    expected = time.time() + 15 * 60
+    case.after_escalations()
+    reminder = case.reminder
+    scheduled = case.app.run_on_main_loop(case.app.scheduler.next_due_time) == reminder.trigger_time
+    reloaded = case.restart()
+    kept = reloaded is not None and not reloaded['triggered'] and reloaded['trigger_time'] == reminder.trigger_time
+    ok = (case.shown() == 1 and not reminder.triggered and abs(reminder.trigger_time - expected) < 5
+          and 'unacknowledged' not in reminder and scheduled and kept)
+    return ok, (f"shown {case.shown()} times, due in {reminder.trigger_time - time.time():.0f}s, "
+                f"scheduled {scheduled}, kept over a restart {kept}")
+
+def case_snooze_recurring(case):
+    # Firing moved it on to the next hour; snoozing takes that occurrence back
+    occurrence = case.reminder.get('occurrence')
+    case.press("snooze-5")
+    due_in = case.reminder.trigger_time - time.time()
+    ok = occurrence == 2 and case.reminder.get('occurrence') == 1 and abs(due_in - 5 * 60) < 5
+    return ok, f"occurrence {occurrence} -> {case.reminder.get('occurrence')}, due in {due_in:.0f}s"
+
+def case_not_seen(case):
+    reloaded = case.restart()
+    return reloaded is not None and reloaded.get('unacknowledged') == 1, \
+        f"unacknowledged after restart {reloaded.get('unacknowledged') if reloaded else None}"
+
+def case_no_actions(case):
+    case.after_escalations()
+    return case.shown() == 1 and not case.notification().actions and 'unacknowledged' not in case.reminder, \
+        f"shown {case.shown()} times, buttons {tuple(case.notification().actions)}"
+
+CASES = (
+    ("buttons", case_buttons, {}),
+    ("escalation", case_escalation, {}),
+    ("done", case_done, {}),
+    ("dismiss", case_dismiss, {}),
+    ("expire", case_expire, {}),
+    ("snooze", case_snooze, {}),
+    ("snooze-recurring", case_snooze_recurring, {'recurrence': "FREQ=HOURLY"}),
+    ("not-seen", case_not_seen, {}),
+    ("no-actions", case_no_actions, {'actions': False}),
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder App notification buttons and escalation")
+    parser.parse_args()
+
+    server = FakeNotifyServer()
+    install_fake_gi(server)
+    from headless import HeadlessApp
+    import reminder_app
+    App = make_app_class(reminder_app, HeadlessApp)
+
+    failed = False
+    for name, check, options in CASES:
+        case = Case(App, server, **options)
+        try:
+            ok, details = check(case)
+        finally:
+            case.finish()
+        failed = failed or not ok
+        print(f"{name:<18} {details}  {'ok' if ok else 'FAILED'}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Check where repeating reminders added from the command line first come due
+
+Runs reminder_app.py --add with --repeat in a throwaway home directory and
+reads the stored reminder back with the headless app from headless.py. A
+cron rule must first fire at its first match at or after the requested
+time. An RRULE treats the requested time as DTSTART: it fires then if the
+rule matches it, and otherwise at the rule's next match. Either way the
+command must print the time the reminder actually comes due.
+
+Exits non-zero unless every case comes due where expected.
+"""
+
+import os
+import sys
+import argparse
+import datetime
+import tempfile
+import subprocess
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "reminder_app.py")
+
+def next_weekday(weekday, hour, after):
+    """The first local time at hour on weekday (Monday is 0) strictly after the date of after"""
+    day = after.date() + datetime.timedelta(days=1)
+    while day.weekday() != weekday:
+        day += datetime.timedelta(days=1)
+    return datetime.datetime.combine(day, datetime.time(hour))
+
+def first_weekday_at(hour, start):
+    """The first local time at hour on Monday to Friday at or after start"""
+    moment = datetime.datetime.combine(start.date(), datetime.time(hour))
+    while moment < start or moment.weekday() > 4:
+        moment += datetime.timedelta(days=1)
+    return moment
+
+def cases(now):
+    # --in 2d from now, so the time of day rarely falls on the rule's 09:00
+    start = (now + datetime.timedelta(days=2)).replace(microsecond=0)
+    yield "cron weekdays --in 2d", ["--in", "2d", "--repeat", "0 9 * * 1-5"], start, first_weekday_at(9, start)
+    tuesday = next_weekday(1, 10, now)
+    yield "weekly MO,WE from a Tuesday", ["--at", tuesday.isoformat(), "--repeat", "FREQ=WEEKLY;BYDAY=MO,WE"], \
+        tuesday, tuesday + datetime.timedelta(days=1)
+    monday = next_weekday(0, 10, now)
+    yield "weekly MO,WE from a Monday", ["--at", monday.isoformat(), "--repeat", "FREQ=WEEKLY;BYDAY=MO,WE"], \
+        monday, monday
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder App first trigger of repeating reminders")
+    parser.parse_args()
+
+    os.environ['HOME'] = tempfile.mkdtemp(prefix="reminder-start-")
+    from headless import HeadlessApp
+    import reminder_app
+
+    failed = False
+    for name, options, start, expected in cases(datetime.datetime.now()):
+        result = subprocess.run([sys.executable, APP, "--add", name] + options, capture_output=True, text=True)
+        app = HeadlessApp(start_checker=False)
+        reminder = next((r for r in app.reminders.values() if r.title == name), None)
+        app.run_on_main_loop(app.shutdown)
+        if reminder is None:
+            failed = True
+            print(f"{name:<30} FAILED, not added: {result.stderr.strip()}")
+            continue
+        due = datetime.datetime.fromtimestamp(reminder.trigger_time)
+        # --in counts from when the command ran, a moment after start was taken
+        anchored = abs(reminder['recurrence_start'] - start.timestamp()) < 60
+        printed = reminder_app.format_trigger_time(reminder.trigger_time) in result.stdout
+        if "--in" in options:
+            expected = first_weekday_at(9, datetime.datetime.fromtimestamp(reminder['recurrence_start']))
+        ok = due == expected and anchored and printed
+        failed = failed or not ok
+        print(f"{name:<30} due {due:%a %Y-%m-%d %H:%M}, expected {expected:%a %Y-%m-%d %H:%M}, "
+              f"printed {printed}  {'ok' if ok else 'FAILED'}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Measure how the reminder service scales with the number of reminders
+
+For each size a fresh interpreter generates a synthetic store in a
+throwaway home directory and runs the headless app from headless.py
+against it, measuring:
+
+- load time: constructing the app, which loads the store and builds the heap
+- full save time (save_reminders) and the latency of single add_reminder calls
+- CPU wakeups per idle hour: context switches of all threads while nothing
+  is due and the socket server is up, extrapolated from --idle-seconds
+- fire latency: from a reminder's due time to it reaching the notification
+  stage (batching by the notification dispatcher comes on top)
+- peak RSS of the process
+- the window's search index: building it (refresh_reminders_list) and the
+  latency of typical searches and filters, which needs no GTK
+
+Results are written as JSON so they can be compared across releases.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import statistics
+import subprocess
+import tempfile
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def context_switches():
+    """Voluntary plus involuntary context switches over all threads of this process"""
+    total = 0
+    for task in os.listdir("/proc/self/task"):
+        try:
+            with open(f"/proc/self/task/{task}/status") as f:
+                for line in f:
+                    if line.startswith(("voluntary_ctxt_switches", "nonvoluntary_ctxt_switches")):
+                        total += int(line.split()[1])
+        except FileNotFoundError:
+            pass  # Thread exited meanwhile
+    return total
+
+def generate_store(reminder_app, storage, size):
+    """Write size synthetic reminders, a quarter of them completed, all due from tomorrow on"""
+    config_dir = reminder_app.default_config_dir()
+    os.makedirs(config_dir, exist_ok=True)
+    start = time.time() + 86400
+    reminders = [
+        {
+            'id': number,
+            'title': f"Reminder {number}",
+            'message': "Synthetic benchmark reminder",
+            'trigger_time': start + number,
+            'triggered': number % 4 == 0,
+        }
+        for number in range(1, size + 1)
+    ]
+    store = reminder_app.STORAGE_BACKENDS[storage](os.path.join(config_dir, "reminders.json"), lambda: reminders)
+    store.save(reminders)
+    store.close()
+
+def time_index(reminder_app, reminders):
+    """Seconds to build the window's search index, and latencies of typical queries"""
+    index = reminder_app.ReminderIndex()
+    start = time.perf_counter()
+    index.reset(reminders)
+    build_seconds = time.perf_counter() - start
+    
+    now = time.time()
+    queries = [
+        {},
+        {'status': "pending"},
+        {'status': "completed"},
+        {'text': "r"},
+        {'text': "remi"},
+        {'text': "reminder 12"},
+        {'text': "synthetic", 'status': "pending"},
+        {'start': now + 86400, 'end': now + 2 * 86400},
+        {'text': "nothing matches this"},
+    ]
+    latencies = []
+    for query in queries * 5:
+        start = time.perf_counter()
+        index.query(**query)
+        latencies.append(time.perf_counter() - start)
+    return build_seconds, latencies
+
+def run_size(args):
+    """Child process: measure one store size and print the result as JSON"""
+    from headless import HeadlessApp
+    import reminder_app
+    
+    generate_store(reminder_app, args.storage, args.size)
+    
+    start = time.perf_counter()
+    app = HeadlessApp(storage=args.storage)
+    load_seconds = time.perf_counter() - start
+    app.serve()
+    
+    def time_saves():
+        start = time.perf_counter()
+        app.save_reminders()
+        full = time.perf_counter() - start
+        
+        latencies = []
+        for number in range(args.adds):
+            start = time.perf_counter()
+            app.add_reminder(f"Added {number}", "", time.time() + 2 * 86400)
+            latencies.append(time.perf_counter() - start)
+        return full, latencies
+    
+    save_seconds, add_latencies = app.run_on_main_loop(time_saves)
+    
+    # Nothing comes due for a day, so every wakeup here is overhead
+    before = context_switches()
+    time.sleep(args.idle_seconds)
+    idle_switches = context_switches() - before
+    
+    due = time.time() + 0.5
+    records = [{'title': f"Due {n}", 'trigger_time': due + n * 2.0 / args.fires} for n in range(args.fires)]
+    app.run_on_main_loop(app.add_reminders, records)
+    deadline = time.time() + 30
+    while len(app.fire_latency) < args.fires and time.time() < deadline:
+        time.sleep(0.05)
+    latencies = app.fire_latency
+    
+    index_seconds, search_latencies = app.run_on_main_loop(lambda: time_index(reminder_app, list(app.reminders.values())))
+    app.run_on_main_loop(app.shutdown)
+    
+    result = {
+        'size': args.size,
+        'storage': args.storage,
+        'load_seconds': load_seconds,
+        'save_seconds': save_seconds,
+        'add_median_seconds': statistics.median(add_latencies),
+        'add_p95_seconds': percentile(add_latencies, 0.95),
+        'idle_wakeups_per_hour': idle_switches * 3600 / args.idle_seconds,
+        'fired': len(latencies),
+        'fire_latency_median_seconds': statistics.median(latencies) if latencies else None,
+        'fire_latency_p95_seconds': percentile(latencies, 0.95) if latencies else None,
+        'fire_latency_max_seconds': max(latencies) if latencies else None,
+        'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'index_seconds': index_seconds,
+        'search_median_seconds': statistics.median(search_latencies),
+        'search_max_seconds': max(search_latencies),
+    }
+    json.dump(result, sys.stdout)
+
+def measure(size, args):
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home)
+        command = [
+            sys.executable, os.path.abspath(__file__), "--child",
+            "--size", str(size),
+            "--storage", args.storage,
+            "--adds", str(args.adds),
+            "--fires", str(args.fires),
+            "--idle-seconds", str(args.idle_seconds),
+        ]
+        output = subprocess.run(command, env=env, stdout=subprocess.PIPE, check=True).stdout
+    return json.loads(output)
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder App scheduler and storage benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Reminder counts to measure (default: 1000 10000 100000)")
+    parser.add_argument("--storage", choices=["journal", "json", "sqlite"], default="journal")
+    parser.add_argument("--adds", type=int, default=200, help="add_reminder calls to time (default: 200)")
+    parser.add_argument("--fires", type=int, default=200, help="Reminders fired for the latency (default: 200)")
+    parser.add_argument("--idle-seconds", type=float, default=10,
+                        help="How long to count idle wakeups (default: 10)")
+    parser.add_argument("--output", "-o", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        run_size(args)
+        return
+    
+    results = {
+        'benchmark': "scheduler",
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': [measure(size, args) for size in args.sizes],
+    }
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    
+    for result in results['results']:
+        print(f"{result['size']:>8}: load {result['load_seconds'] * 1000:8.1f} ms, "
+              f"add p95 {result['add_p95_seconds'] * 1000:6.2f} ms, "
+              f"idle {result['idle_wakeups_per_hour']:7.0f} wakeups/h, "
+              f"fire p95 {(result['fire_latency_p95_seconds'] or 0) * 1000:6.1f} ms, "
+              f"search max {result['search_max_seconds'] * 1000:6.1f} ms, "
+              f"rss {result['peak_rss_bytes'] / 2**20:6.1f} MiB", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
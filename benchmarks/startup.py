@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Measure how long reminder-app takes from process start to its first output
+
+Each command runs in a fresh interpreter against a throwaway home directory.
+"Cold" runs start with an empty bytecode cache; "warm" runs reuse the cache
+left behind by the cold run. Results are written as JSON so they can be
+compared across releases.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+REMINDER_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "reminder_app.py")
+
+COMMANDS = {
+    'import': [sys.executable, "-c", "import reminder_app; print('imported')"],
+    'status': [sys.executable, REMINDER_APP, "--status"],
+    'list': [sys.executable, REMINDER_APP, "--list"],
+    'add': [sys.executable, REMINDER_APP, "--add", "Benchmark", "--in", "1d"],
+}
+
+def time_to_first_output(command, env):
+    """Run command and return the seconds until it printed its first line"""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    process.stdout.read()
+    if process.wait() != 0:
+        raise RuntimeError(f"{' '.join(command)} exited with {process.returncode}")
+    return elapsed
+
+def measure(name, command, runs):
+    with tempfile.TemporaryDirectory() as home, tempfile.TemporaryDirectory() as cache:
+        env = dict(
+            os.environ,
+            HOME=home,
+            PYTHONPYCACHEPREFIX=cache,
+            PYTHONPATH=os.path.dirname(os.path.abspath(REMINDER_APP)),
+        )
+        
+        cold = time_to_first_output(command, env)
+        warm = [time_to_first_output(command, env) for _ in range(runs)]
+    return {
+        'command': name,
+        'cold_seconds': cold,
+        'warm_median_seconds': statistics.median(warm),
+        'warm_min_seconds': min(warm),
+        'warm_runs': runs,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder App startup benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="Warm runs per command (default: 10)")
+    parser.add_argument("--output", "-o", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("commands", nargs="*", metavar="COMMAND",
+                        help=f"Commands to measure: {', '.join(sorted(COMMANDS))} (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.commands) - set(COMMANDS)
+    if unknown:
+        parser.error(f"unknown commands: {', '.join(sorted(unknown))}")
+    
+    results = {
+        'benchmark': "startup",
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': [measure(name, COMMANDS[name], args.runs) for name in (args.commands or sorted(COMMANDS))],
+    }
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    
+    for result in results['results']:
+        print(f"{result['command']:>8}: cold {result['cold_seconds'] * 1000:7.1f} ms, "
+              f"warm {result['warm_median_seconds'] * 1000:7.1f} ms", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
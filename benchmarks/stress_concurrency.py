@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Hammer a ReminderAppBase with concurrent adds, removes and fires
+
+Worker threads add, remove and clean up reminders while the checker thread
+fires them and the system pretends to suspend and resume now and then, all
+against a throwaway home directory with the headless app from headless.py.
+Exits non-zero unless every reminder that was not removed fired exactly
+once, none fired early, and none fired twice.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+def worker(app, seed, operations, spread, added, removed, lock):
+    rng = random.Random(seed)
+    mine = []
+    for _ in range(operations):
+        action = rng.random()
+        if action < 0.6:
+            due = time.time() + rng.uniform(0, spread)
+            reminder = app.run_on_main_loop(app.add_reminder, f"r{seed}", "stress", due)
+            mine.append(reminder['id'])
+        elif action < 0.7:
+            records = [{'title': f"b{seed}", 'trigger_time': time.time() + rng.uniform(0, spread)} for _ in range(5)]
+            before = set(app.run_on_main_loop(lambda: list(app.reminders)))
+            app.run_on_main_loop(app.add_reminders, records)
+            # Only this worker's batch can be new, apart from other workers' adds
+            with lock:
+                new = set(app.run_on_main_loop(lambda: list(app.reminders))) - before - set(added)
+                added.update(new)
+        elif action < 0.95 and mine:
+            reminder_id = mine.pop(rng.randrange(len(mine)))
+            app.run_on_main_loop(app.remove_reminder, reminder_id)
+            with lock:
+                removed.add(reminder_id)
+        else:
+            app.run_on_main_loop(app.cleanup_completed_reminders)
+        with lock:
+            added.update(mine)
+        time.sleep(rng.uniform(0, 0.002))
+
+def sleep_cycles(app, stop):
+    """Fake a suspend and resume every 100 ms; the default policy fires everything"""
+    while not stop.wait(0.1):
+        app.call_soon(app.sleep_monitor.prepare_for_sleep, True)
+        app.call_soon(app.sleep_monitor.prepare_for_sleep, False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder App concurrency stress test")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--operations", type=int, default=500, help="Operations per thread")
+    parser.add_argument("--spread", type=float, default=1.0, help="Seconds over which reminders come due")
+    parser.add_argument("--storage", choices=["journal", "json", "sqlite"], default="journal")
+    args = parser.parse_args()
+    
+    os.environ['HOME'] = tempfile.mkdtemp(prefix="reminder-stress-")
+    from headless import HeadlessApp
+    app = HeadlessApp(storage=args.storage)
+    
+    added, removed, lock = set(), set(), threading.Lock()
+    workers = [
+        threading.Thread(target=worker, args=(app, seed, args.operations, args.spread, added, removed, lock))
+        for seed in range(args.threads)
+    ]
+    start = time.time()
+    for thread in workers:
+        thread.start()
+    stop = threading.Event()
+    sleeper = threading.Thread(target=sleep_cycles, args=(app, stop))
+    sleeper.start()
+    for thread in workers:
+        thread.join()
+    stop.set()
+    sleeper.join()
+    
+    # Give the last reminders time to come due and fire
+    expected = added - removed
+    deadline = time.time() + args.spread + 5
+    while time.time() < deadline and any(app.fired[i] == 0 for i in expected):
+        time.sleep(0.05)
+    app.run_on_main_loop(app.shutdown)
+    
+    missed = [i for i in expected if app.fired[i] == 0]
+    repeated = [i for i, count in app.fired.items() if count > 1]
+    print(f"{len(added)} added, {len(removed)} removed, {sum(app.fired.values())} fired "
+          f"in {time.time() - start:.1f}s")
+    print(f"missed {len(missed)}, fired twice {len(repeated)}, fired early {len(app.early)}")
+    return 1 if missed or repeated or app.early else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Check that the window follows reminder changes without replacing its model
+
+Builds the real ReminderWindow over the headless app from headless.py and
+adds, moves and removes reminders while a row is selected and the list is
+scrolled. The view must keep the same model, selection and scroll position,
+hear about each change as single rows inserted, deleted or changed, show
+exactly what ReminderIndex.query() returns, and stay in fixed-height mode.
+Needs GTK 3 and a display; without one, run it under Xvfb:
+
+    xvfb-run -a python3 benchmarks/window_model.py
+
+Exits non-zero unless every check holds.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+def pump(Gtk, until=None, timeout=5):
+    """Run the GTK main loop until until() holds or nothing is pending"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        while Gtk.events_pending():
+            Gtk.main_iteration_do(False)
+        if until is None or until():
+            return True
+        time.sleep(0.01)
+    return False
+
+class Signals:
+    """Counts the row signals a model emits"""
+
+    def __init__(self, model):
+        self.counts = dict.fromkeys(("row-inserted", "row-deleted", "row-changed"), 0)
+        for signal in self.counts:
+            model.connect(signal, self.on_signal, signal)
+
+    def on_signal(self, model, *args):
+        self.counts[args[-1]] += 1
+
+    def take(self):
+        counts = dict(self.counts)
+        for signal in self.counts:
+            self.counts[signal] = 0
+        return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Reminder App window model updates")
+    parser.add_argument("--reminders", type=int, default=2000, help="Reminders in the list to scroll")
+    args = parser.parse_args()
+
+    os.environ['HOME'] = tempfile.mkdtemp(prefix="reminder-window-")
+    from headless import HeadlessApp
+    import reminder_app
+    ReminderWindow = reminder_app.gui_classes()[0]
+    Gtk = reminder_app.Gtk
+
+    backend = HeadlessApp(start_checker=False)
+    now = time.time()
+    backend.add_reminders({'title': f"Reminder {i}", 'trigger_time': now + 3600 + i * 60}
+                          for i in range(args.reminders))
+
+    application = Gtk.Application()
+    application.register(None)
+    application.backend = backend
+    application.options = {}
+    window = ReminderWindow(application=application)
+    window.show_all()
+    view = window.reminder_view
+    model = view.get_model()
+    signals = Signals(model)
+    selection = view.get_selection()
+    pump(Gtk)
+
+    failures = []
+    def check(name, ok, details=""):
+        print(f"{name:<34} {'ok' if ok else 'FAILED'}{' ' + details if details and not ok else ''}")
+        if not ok:
+            failures.append(name)
+
+    def shown_ids():
+        return [int(row[0]) for row in view.get_model()]
+
+    def selected_id():
+        rows, iter_ = selection.get_selected()
+        return int(rows[iter_][0]) if iter_ is not None else None
+
+    def change(func, *args):
+        """Change the reminders on the backend and wait for the window to apply it"""
+        func(*args)
+        pump(Gtk, lambda: not window.pending_changes and window.apply_source is None)
+
+    def edit(reminder_id, **fields):
+        """Change fields of a reminder the way an outside edit of the file does"""
+        reminder = backend.reminders[reminder_id]
+        backend.scheduler.discard(reminder)
+        for field, value in fields.items():
+            reminder[field] = value
+        backend.scheduler.push(reminder)
+        backend.notify_change("updated", reminder)
+
+    def in_query_order():
+        return shown_ids() == window.index.query(*window.filter_values())
+
+    # Select a row in the middle and scroll so it is in view
+    middle = args.reminders // 2
+    path = Gtk.TreePath.new_from_indices([middle])
+    selection.select_path(path)
+    view.scroll_to_cell(path, None, True, 0.5, 0.0)
+    pump(Gtk)
+    selected = selected_id()
+    scrolled = window.list_adjustment.get_value()
+
+    # Before everything shown, after everything shown, and moved
+    change(backend.add_reminder, "Early", "", now + 60)
+    check("added before the selection", in_query_order())
+    change(backend.add_reminder, "Late", "", now + 10 * 86400)
+    moved = shown_ids()[-10]
+    change(edit, moved, trigger_time=now + 120)
+    check("moved up the list", shown_ids().index(moved) == 1 and in_query_order())
+    counts = signals.take()
+    check("one row signal per change", counts == {'row-inserted': 3, 'row-deleted': 1, 'row-changed': 0}, str(counts))
+
+    # Removed and edited in place
+    removed = shown_ids()[-1]
+    change(backend.remove_reminder, removed)
+    edited = shown_ids()[-5]
+    change(edit, edited, title="Edited")
+    counts = signals.take()
+    check("removed and edited rows", removed not in shown_ids() and counts == {'row-inserted': 0, 'row-deleted': 1, 'row-changed': 1},
+          str(counts))
+
+    check("same model", view.get_model() is model)
+    check("selection kept", selected_id() == selected, f"{selected_id()} != {selected}")
+    # Two rows were added above the selection, so the view may have moved by those
+    row_height = view.get_cell_area(path, view.get_column(0)).height
+    check("scroll position kept", abs(window.list_adjustment.get_value() - scrolled) <= 2 * row_height,
+          f"{window.list_adjustment.get_value()} != {scrolled}")
+
+    # A search only shows matching reminders, also as they are added
+    window.search_entry.set_text("reminder 1")
+    pump(Gtk)
+    filtered = view.get_model()
+    change(backend.add_reminder, "Reminder 1 again", "", now + 7200)
+    change(backend.add_reminder, "Something else", "", now + 7200)
+    check("filter follows additions", in_query_order())
+    check("filter keeps its model", view.get_model() is filtered)
+
+    check("fixed-height mode", view.get_fixed_height_mode()
+          and all(column.get_sizing() == Gtk.TreeViewColumnSizing.FIXED for column in view.get_columns()))
+
+    window.destroy()
+    backend.run_on_main_loop(backend.shutdown)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,45 +1,4239 @@
 #!/usr/bin/env python3
 
 import os
+import re
+import csv
+import io
 import json
+import array
+import gzip
+import zlib
+import hashlib
+import collections
 import datetime
+import functools
+import heapq
+import bisect
+import operator
+import itertools
 import time
 import threading
+import queue
+import socket
+import socketserver
+import selectors
+import errno
+import fcntl
+import signal
+import sqlite3
 import sys
 import argparse
 from pathlib import Path
 
-# Parse command line arguments early to check for background mode
-parser = argparse.ArgumentParser(description="Reminder Application")
-parser.add_argument("--background", "-b", action="store_true", help="Run in background mode")
-parser.add_argument("--show-ui", "-u", action="store_true", help="Show UI (ignores background mode)")
-args, remaining_args = parser.parse_known_args()
+# GObject introspection modules, imported on first use by require_gi() since
+# loading them takes far longer than anything the command line options do
+Notify = GLib = Gio = Gtk = GObject = None
 
-# Only import GUI libraries if not in background mode or show-ui is requested
-BACKGROUND_MODE = args.background and not args.show_ui
-GUI_AVAILABLE = not BACKGROUND_MODE
+def require_gi(gtk=False):
+    """Import libnotify, GLib and Gio, plus GTK and GObject if asked, unless already done"""
+    global Notify, GLib, Gio, Gtk, GObject
+    import gi
+    if Notify is None:
+        gi.require_version('Notify', '0.7')
+        from gi.repository import Notify as notify_module, GLib as glib_module, Gio as gio_module
+        Notify, GLib, Gio = notify_module, glib_module, gio_module
+    if gtk and Gtk is None:
+        gi.require_version('Gtk', '3.0')
+        from gi.repository import Gtk as gtk_module, GObject as gobject_module
+        Gtk, GObject = gtk_module, gobject_module
 
-# Import notification system - always needed
-import gi
-gi.require_version('Notify', '0.7')
-from gi.repository import Notify
+@functools.lru_cache(maxsize=4096)
+def format_trigger_time(trigger_time):
+    """Format a trigger timestamp for display, cached since it rarely changes"""
+    return datetime.datetime.fromtimestamp(trigger_time).strftime("%Y-%m-%d %H:%M")
 
-# Only import GTK if GUI is needed
-if GUI_AVAILABLE:
-    gi.require_version('Gtk', '3.0')
-    from gi.repository import Gtk, GLib, Gio
+# In-memory reminder records
+class Reminder:
+    """One reminder with typed fields, far smaller than a dict per reminder
 
-# For background mode, we need GLib for the main loop
-if BACKGROUND_MODE:
-    from gi.repository import GLib, Gio
+    Keys beyond the standard fields (recurrence, occurrence, missed, ...)
+    live in extra, which stays None for plain reminders. Item access
+    mirrors the dict records used on disk and over the socket, so code
+    that handles both can keep using reminder['title'] and
+    reminder.get('recurrence'); hot paths use the attributes.
+    """
+    
+    __slots__ = ('id', 'title', 'message', 'trigger_time', 'triggered', 'extra')
+    FIELDS = ('id', 'title', 'message', 'trigger_time', 'triggered')
+    FIELD_SET = frozenset(FIELDS)
+    
+    def __init__(self, id, title, message, trigger_time, triggered=False, extra=None):
+        self.id = id
+        self.title = title
+        self.message = message
+        self.trigger_time = trigger_time
+        self.triggered = triggered
+        self.extra = extra
+    
+    @classmethod
+    def from_dict(cls, record):
+        """Validate and convert a stored record, raising ValueError, KeyError or TypeError"""
+        extra = None
+        if not cls.FIELD_SET.issuperset(record):
+            extra = {key: value for key, value in record.items() if key not in cls.FIELD_SET}
+        return cls(
+            int(record['id']),
+            sys.intern(str(record.get('title', ""))),
+            str(record.get('message', "")),
+            float(record['trigger_time']),
+            bool(record.get('triggered', False)),
+            extra
+        )
+    
+    def to_dict(self):
+        record = {
+            'id': self.id,
+            'title': self.title,
+            'message': self.message,
+            'trigger_time': self.trigger_time,
+            'triggered': self.triggered,
+        }
+        if self.extra:
+            record.update(self.extra)
+        return record
+    
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.extra is None:
+            raise KeyError(key)
+        return self.extra[key]
+    
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        elif self.extra is None:
+            self.extra = {key: value}
+        else:
+            self.extra[key] = value
+    
+    def __contains__(self, key):
+        return key in self.FIELDS or (self.extra is not None and key in self.extra)
+    
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.extra is None:
+            return default
+        return self.extra.get(key, default)
+    
+    def keys(self):
+        return list(self.FIELDS) + list(self.extra or ())
+    
+    def items(self):
+        return self.to_dict().items()
+    
+    def __repr__(self):
+        return f"Reminder({self.to_dict()!r})"
+
+def json_default(value):
+    """json.dump hook writing Reminder records as plain objects"""
+    if isinstance(value, Reminder):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def reminder_list_name(reminder):
+    """Name of the list a reminder or record belongs to"""
+    return reminder.get('list') or ReminderList.DEFAULT
+
+class CompletedArchive:
+    """Completed reminders stored column-wise rather than as one object each
+
+    Ids, trigger times and flags sit in arrays and titles and messages are
+    interned, so a large history costs a few dozen bytes per reminder.
+    Records come back out as plain dicts. Extra keys are kept only for the
+    records that have any.
+    """
+    
+    MISSED = 1
+    
+    def __init__(self):
+        self.ids = array.array('q')
+        self.trigger_times = array.array('d')
+        self.flags = array.array('B')
+        self.titles = []
+        self.messages = []
+        self.extras = {}  # index -> extra keys
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def append(self, record):
+        extra = {k: v for k, v in record.items() if k not in Reminder.FIELDS and k != 'missed'}
+        if extra:
+            self.extras[len(self.ids)] = extra
+        self.ids.append(int(record['id']))
+        self.trigger_times.append(float(record['trigger_time']))
+        self.flags.append(self.MISSED if record.get('missed') else 0)
+        self.titles.append(sys.intern(str(record.get('title', ""))))
+        self.messages.append(sys.intern(str(record.get('message', ""))))
+    
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            yield self.record(index)
+    
+    def record(self, index):
+        record = {
+            'id': self.ids[index],
+            'title': self.titles[index],
+            'message': self.messages[index],
+            'trigger_time': self.trigger_times[index],
+            'triggered': True,
+        }
+        if self.flags[index] & self.MISSED:
+            record['missed'] = True
+        if index in self.extras:
+            record.update(self.extras[index])
+        return record
+    
+    def copy(self):
+        """Return an independent copy, cheap since the columns are copied wholesale"""
+        archive = CompletedArchive()
+        archive.ids = self.ids[:]
+        archive.trigger_times = self.trigger_times[:]
+        archive.flags = self.flags[:]
+        archive.titles = self.titles[:]
+        archive.messages = self.messages[:]
+        archive.extras = dict(self.extras)
+        return archive
+    
+    def clear(self):
+        self.__init__()
+    
+    def drop_older_than(self, timestamp):
+        """Remove the records due before timestamp and return their ids"""
+        keep = [i for i, t in enumerate(self.trigger_times) if t >= timestamp]
+        if len(keep) == len(self.ids):
+            return []
+        kept = set(keep)
+        dropped = [self.ids[i] for i in range(len(self.ids)) if i not in kept]
+        
+        self.ids = array.array('q', (self.ids[i] for i in keep))
+        self.trigger_times = array.array('d', (self.trigger_times[i] for i in keep))
+        self.flags = array.array('B', (self.flags[i] for i in keep))
+        self.titles = [self.titles[i] for i in keep]
+        self.messages = [self.messages[i] for i in keep]
+        self.extras = {new: self.extras[old] for new, old in enumerate(keep) if old in self.extras}
+        return dropped
+    
+    def max_id(self):
+        return max(self.ids, default=0)
+
+def atomic_write_json(path, data):
+    """Write data as JSON to path so readers only ever see the old or new file
+
+    Returns the content_digest() of what was written.
+    """
+    # Encoding in one go is several times faster than json.dump's chunks
+    content = json.dumps(data, default=json_default).encode()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    
+    # Persist the rename itself
+    dir_fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return content_digest(content)
+
+def content_digest(content):
+    """Digest telling whether two versions of a file hold the same bytes"""
+    return hashlib.sha1(content).digest()
+
+def file_signature(path):
+    """Inode, modification time and size of path, which a rewrite changes"""
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def parse_json_list(content):
+    """Parse content as a JSON list, or return None if it is not one"""
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+    return data if isinstance(data, list) else None
+
+def record_ids(records):
+    """The ids of a parsed JSON list of reminder records, skipping malformed entries"""
+    return {record.get('id') for record in records if isinstance(record, dict)}
+
+def read_json_list(path):
+    """Read a JSON list from path, treating a missing or corrupt file as empty"""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            data = parse_json_list(f.read())
+        if data is not None:
+            return data
+    return []
+
+# Storage backends for the reminder list
+class ReminderStore:
+    """Interface shared by the storage backends
+
+    snapshot is a callable returning the full current list of reminders; it
+    is used by backends that need to rewrite everything at once.
+    """
+
+    def __init__(self, path, snapshot):
+        self.path = path
+        self.snapshot = snapshot
+        # Completed reminders this many seconds old or newer are loaded like pending ones
+        self.recent_completed = 0
+
+    def load(self):
+        """Return the stored pending reminders and the completed ones within recent_completed"""
+        raise NotImplementedError
+
+    def put(self, reminders):
+        """Persist new or changed reminders"""
+        raise NotImplementedError
+
+    def delete(self, reminder_ids):
+        """Persist the removal of reminders"""
+        raise NotImplementedError
+
+    def delete_completed(self, reminder_ids):
+        """Persist the removal of all completed reminders, returning how many went
+
+        reminder_ids are the completed reminders currently held in memory.
+        """
+        self.delete(reminder_ids)
+        return len(reminder_ids)
+
+    def save(self, reminders):
+        """Persist the full list of reminders in one go"""
+        raise NotImplementedError
+
+    def iter_history(self, exclude):
+        """Yield stored reminders that are not held in memory
+
+        exclude holds the ids that are in memory. Backends that load
+        everything have nothing to add.
+        """
+        return iter(())
+
+    def max_history_id(self):
+        """Highest id among the stored reminders not held in memory, or 0"""
+        return 0
+
+    def history_ids(self):
+        """Ids of the stored reminders not held in memory that can clash with loaded ones
+
+        Backends keying reminders by id can hold no clashes, so they have
+        nothing to report.
+        """
+        return set()
+
+    def completed_older_than(self, timestamp):
+        """Yield stored completed reminders not held in memory due before timestamp"""
+        return iter(())
+
+    def delete_completed_older_than(self, timestamp):
+        """Persist the removal of the reminders completed_older_than() returns"""
+
+    def watched_path(self):
+        """File other programs may edit behind the app's back, or None"""
+        return None
+
+    def reload_if_changed(self):
+        """Return the pending records like load() if the watched file was changed elsewhere, else None"""
+        return None
+
+    def local_changes(self):
+        """Ids of reminders changed here that the watched file does not show yet"""
+        return set()
+
+    def watched_ids(self):
+        """Ids in the watched file as it was last read or written here"""
+        return set()
+
+    def close(self):
+        """Flush and release any resources held by the backend"""
+
+class ArchivingStore(ReminderStore):
+    """Base for the JSON file backends, keeping completed reminders columnar
+
+    load() only returns pending and recently completed reminders. Older
+    completed ones go into a CompletedArchive and are written back along
+    with the snapshot.
+    """
+
+    def __init__(self, path, snapshot):
+        super().__init__(path, snapshot)
+        self.history = CompletedArchive()
+        # Signature and digest of the file as last read or written here
+        self.file_state = (None, None)
+        # Ids of the records in it then
+        self.file_ids = set()
+
+    def read_file(self):
+        """Return the records in the file, treating a missing or corrupt file as empty"""
+        try:
+            signature = file_signature(self.path)
+            with open(self.path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            self.file_state = (None, None)
+            self.file_ids = set()
+            return []
+        self.file_state = (signature, content_digest(content))
+        records = parse_json_list(content)
+        records = [] if records is None else records
+        self.file_ids = record_ids(records)
+        return records
+
+    def write_file(self, records):
+        """Atomically replace the file with records, remembering it as written here"""
+        digest = atomic_write_json(self.path, records)
+        self.file_state = (file_signature(self.path), digest)
+        self.file_ids = record_ids(records)
+
+    def watched_path(self):
+        return self.path
+
+    def watched_ids(self):
+        return set(self.file_ids)
+
+    def reload_if_changed(self):
+        """Return the pending records like load() if the file was changed elsewhere, else None
+
+        A new signature alone only costs hashing the file; it is parsed when
+        the content differs from what was last read or written here, and
+        skipped while it is not a valid list, e.g. half written by an
+        editor. The history is replaced by the file's.
+        """
+        try:
+            signature = file_signature(self.path)
+        except FileNotFoundError:
+            return None
+        if signature == self.file_state[0]:
+            return None
+        with open(self.path, 'rb') as f:
+            content = f.read()
+        digest = content_digest(content)
+        if digest == self.file_state[1]:
+            self.file_state = (signature, digest)
+            return None
+        records = parse_json_list(content)
+        if records is None:
+            return None
+        self.file_state = (signature, digest)
+        self.file_ids = record_ids(records)
+        self.history = CompletedArchive()
+        return self.split_history(records)
+
+    def split_history(self, records):
+        """Move the completed records older than recent_completed into the archive and return the rest"""
+        cutoff = time.time() - self.recent_completed
+        loaded = []
+        for record in records:
+            trigger_time = record.get('trigger_time')
+            if record.get('triggered') and not (isinstance(trigger_time, (int, float)) and trigger_time >= cutoff):
+                self.history.append(record)
+            else:
+                loaded.append(record)
+        return loaded
+
+    def delete_completed(self, reminder_ids):
+        count = len(reminder_ids) + len(self.history)
+        self.history.clear()
+        # Much smaller without the history, so rewrite it in one go
+        self.save(self.snapshot())
+        return count
+
+    def iter_history(self, exclude):
+        # A copy, since the archive may change between pages of a slow reader
+        return (record for record in self.history.copy() if record['id'] not in exclude)
+
+    def max_history_id(self):
+        return self.history.max_id()
+
+    def history_ids(self):
+        return set(self.history.ids)
+
+    def completed_older_than(self, timestamp):
+        return (record for record in self.history.copy() if record['trigger_time'] < timestamp)
+
+    def delete_completed_older_than(self, timestamp):
+        dropped = self.history.drop_older_than(timestamp)
+        if dropped:
+            self.delete(dropped)
+
+class JsonFileStore(ArchivingStore):
+    """The whole list as one JSON file, rewritten atomically on every change"""
+
+    def __init__(self, path, snapshot):
+        super().__init__(path, snapshot)
+        self._lock = threading.Lock()
+
+    def load(self):
+        return self.split_history(self.read_file())
+
+    def put(self, reminders):
+        self.save(self.snapshot())
+
+    def delete(self, reminder_ids):
+        self.save(self.snapshot())
+
+    def save(self, reminders):
+        with self._lock:
+            self.write_file(list(reminders) + list(self.history))
+
+class JournalStore(ArchivingStore):
+    """Snapshot file plus an append-only JSON-lines journal of changes
+
+    The snapshot keeps the legacy reminders.json format and is only
+    rewritten when the journal grows past compact_threshold bytes; every
+    change in between costs one appended, fsynced line. Journal records are
+    idempotent, so replaying one that is already folded into the snapshot is
+    harmless.
+    """
+
+    def __init__(self, path, snapshot, compact_threshold=1024 * 1024):
+        super().__init__(path, snapshot)
+        self.journal_path = os.path.splitext(path)[0] + ".journal"
+        self.rotated_path = self.journal_path + ".1"
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._journal = None
+        self._compactor = None
+        # Ids changed by the journal since the snapshot was written
+        self.journaled = set()
+
+    def load(self):
+        reminders = self.read_file()
+        positions = {}
+        for index, reminder in enumerate(reminders):
+            positions.setdefault(reminder.get('id'), []).append(index)
+        
+        recovered = os.path.exists(self.rotated_path)
+        for journal_path in (self.rotated_path, self.journal_path):
+            for record in self._read_journal(journal_path):
+                self.journaled.update(self._apply(record, reminders, positions))
+        reminders = [r for r in reminders if r is not None]
+        
+        # A leftover rotated journal means a compaction was interrupted
+        if recovered:
+            with self._lock:
+                self._write_snapshot(reminders)
+                self._reset_journal()
+                os.remove(self.rotated_path)
+        return self.split_history(reminders)
+
+    def put(self, reminders):
+        self._append([{'op': 'put', 'reminder': r} for r in reminders])
+        self.journaled.update(r['id'] for r in reminders)
+
+    def delete(self, reminder_ids):
+        self._append([{'op': 'delete', 'ids': list(reminder_ids)}])
+        self.journaled.update(reminder_ids)
+
+    def reload_if_changed(self):
+        # The snapshot a running compaction writes is not a change from elsewhere
+        self.wait_for_compaction()
+        return super().reload_if_changed()
+
+    def local_changes(self):
+        return set(self.journaled)
+
+    def save(self, reminders):
+        self.wait_for_compaction()
+        with self._lock:
+            self._write_snapshot(list(reminders))
+            self._reset_journal()
+
+    def close(self):
+        self.wait_for_compaction()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished"""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def _append(self, records):
+        data = "".join(json.dumps(record, default=json_default) + "\n" for record in records)
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'a')
+            self._journal.write(data)
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            size = self._journal.tell()
+        
+        if size >= self.compact_threshold:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        """Rotate the journal and fold it into a new snapshot in the background"""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            
+            # Copy and rotate under the lock so no appended change falls between
+            reminders = [dict(r) for r in self.snapshot()]
+            history = self.history.copy()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            os.replace(self.journal_path, self.rotated_path)
+            self.journaled = set()
+            
+            self._compactor = threading.Thread(target=self._compact, args=(reminders, history))
+            self._compactor.daemon = True
+            self._compactor.start()
+
+    def _compact(self, reminders, history):
+        reminders.extend(history)
+        self.write_file(reminders)
+        os.remove(self.rotated_path)
+
+    def _write_snapshot(self, reminders):
+        self.write_file(list(reminders) + list(self.history))
+
+    def _reset_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, 'w')
+        self.journaled = set()
+
+    @staticmethod
+    def _read_journal(journal_path):
+        if not os.path.exists(journal_path):
+            return
+        with open(journal_path, 'r') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write from a crash mid-append; nothing follows it
+                    return
+
+    @staticmethod
+    def _apply(record, reminders, positions):
+        """Replay one journal record, returning the ids it changed"""
+        if record.get('op') == 'put':
+            reminder = record['reminder']
+            indexes = positions.get(reminder['id'])
+            if indexes:
+                reminders[indexes[-1]] = reminder
+            else:
+                positions[reminder['id']] = [len(reminders)]
+                reminders.append(reminder)
+            return (reminder['id'],)
+        elif record.get('op') == 'delete':
+            for reminder_id in record['ids']:
+                for index in positions.pop(reminder_id, ()):
+                    reminders[index] = None
+            return record['ids']
+        return ()
+
+class SqliteStore(ReminderStore):
+    """Reminders in an SQLite database next to reminders.json
+
+    Only pending and recently completed reminders are loaded into memory;
+    older completed ones stay in the database and are reached through the
+    query helpers, so memory use does not grow with the history. Keys the base columns do not cover are kept
+    as JSON in the data column.
+    """
+
+    COLUMNS = ('id', 'title', 'message', 'trigger_time', 'triggered')
+    # PRAGMA user_version once reminders.json has been copied in
+    MIGRATED_VERSION = 1
+
+    def __init__(self, path, snapshot):
+        super().__init__(path, snapshot)
+        self.db_path = os.path.splitext(path)[0] + ".db"
+        self._lock = threading.Lock()
+        
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS reminders ("
+                " id INTEGER PRIMARY KEY,"
+                " title TEXT NOT NULL,"
+                " message TEXT NOT NULL,"
+                " trigger_time REAL NOT NULL,"
+                " triggered INTEGER NOT NULL DEFAULT 0,"
+                " data TEXT)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS reminders_due"
+                " ON reminders (triggered, trigger_time)"
+            )
+        
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < self.MIGRATED_VERSION:
+            if self._db.execute("SELECT 1 FROM reminders LIMIT 1").fetchone() is None:
+                migrate_json_to_sqlite(path, self)
+            else:
+                # Filled before the version was recorded, so the migration already ran
+                with self._db:
+                    self._db.execute(f"PRAGMA user_version = {self.MIGRATED_VERSION}")
+
+    def load(self):
+        return list(self._query(
+            "WHERE triggered = 0 OR trigger_time >= ? ORDER BY trigger_time",
+            (time.time() - self.recent_completed,)
+        ))
+
+    def put(self, reminders, user_version=None):
+        """Insert or replace reminders, setting user_version in the same transaction if given"""
+        rows = [self._to_row(r) for r in reminders]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO reminders"
+                " (id, title, message, trigger_time, triggered, data)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            if user_version is not None:
+                self._db.execute(f"PRAGMA user_version = {int(user_version)}")
+
+    def delete(self, reminder_ids):
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM reminders WHERE id = ?",
+                [(reminder_id,) for reminder_id in reminder_ids]
+            )
+
+    def delete_completed(self, reminder_ids):
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM reminders WHERE triggered = 1").rowcount
+
+    def save(self, reminders):
+        # The history is not in memory, so a full save can only upsert
+        self.put(reminders)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def iter_history(self, exclude, batch_size=1000):
+        last_id = None
+        while True:
+            # Page by id so the lock is never held across a yield
+            if last_id is None:
+                page = list(self._query("WHERE triggered = 1 ORDER BY id LIMIT ?", (batch_size,)))
+            else:
+                page = list(self._query("WHERE triggered = 1 AND id > ? ORDER BY id LIMIT ?", (last_id, batch_size)))
+            if not page:
+                return
+            for reminder in page:
+                if reminder['id'] not in exclude:
+                    yield reminder
+            last_id = page[-1]['id']
+
+    def max_history_id(self):
+        with self._lock:
+            return self._db.execute("SELECT MAX(id) FROM reminders WHERE triggered = 1").fetchone()[0] or 0
+
+    def next_due(self, limit):
+        """Return the next limit pending reminders in trigger order"""
+        return list(self._query("WHERE triggered = 0 ORDER BY trigger_time LIMIT ?", (limit,)))
+
+    def pending_count(self):
+        """Return the number of pending reminders"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM reminders WHERE triggered = 0"
+            ).fetchone()[0]
+
+    def completed_older_than(self, timestamp):
+        """Yield completed reminders whose trigger time is before timestamp"""
+        return self._query("WHERE triggered = 1 AND trigger_time < ? ORDER BY trigger_time", (timestamp,))
+
+    def delete_completed_older_than(self, timestamp):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM reminders WHERE triggered = 1 AND trigger_time < ?", (timestamp,))
+
+    def _query(self, clause, params=()):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, title, message, trigger_time, triggered, data FROM reminders " + clause,
+                params
+            ).fetchall()
+        return (self._from_row(row) for row in rows)
+
+    def _to_row(self, reminder):
+        extra = {k: v for k, v in reminder.items() if k not in self.COLUMNS}
+        return (
+            reminder['id'],
+            reminder['title'],
+            reminder['message'],
+            float(reminder['trigger_time']),
+            int(bool(reminder['triggered'])),
+            json.dumps(extra) if extra else None,
+        )
+
+    @staticmethod
+    def _from_row(row):
+        reminder = {
+            'id': row[0],
+            'title': row[1],
+            'message': row[2],
+            'trigger_time': row[3],
+            'triggered': bool(row[4]),
+        }
+        if row[5]:
+            reminder.update(json.loads(row[5]))
+        return reminder
+
+class WriteBehindStore(ReminderStore):
+    """Collect the changes for another store and write them out together
+
+    put() and delete() only note the latest change per reminder and ask
+    call_later for a flush after delay seconds; changes made meanwhile go
+    out with that same flush, so a burst costs one write per kind of change
+    instead of one per reminder. Everything that reads or rewrites the
+    wrapped store flushes first, and close() flushes what is left. Only
+    used from the main loop that owns the reminder state.
+    """
+
+    def __init__(self, store, call_later, delay, metrics=None):
+        super().__init__(store.path, store.snapshot)
+        self.store = store
+        self.call_later = call_later
+        self.delay = delay
+        # ServiceMetrics to record the flush times in, or None
+        self.metrics = metrics
+        # Reminder by id, or None once it was deleted
+        self.changes = {}
+        self.flush_scheduled = False
+        self.counters = {'changes': 0, 'writes': 0, 'avoided': 0}
+
+    def load(self):
+        return self.store.load()
+
+    def put(self, reminders):
+        for reminder in reminders:
+            self.changes[reminder['id']] = reminder
+        self._changed()
+
+    def delete(self, reminder_ids):
+        for reminder_id in reminder_ids:
+            self.changes[reminder_id] = None
+        self._changed()
+
+    def delete_completed(self, reminder_ids):
+        self.flush()
+        return self.store.delete_completed(reminder_ids)
+
+    def save(self, reminders):
+        self.flush()
+        self.store.save(reminders)
+
+    def iter_history(self, exclude):
+        self.flush()
+        return self.store.iter_history(exclude)
+
+    def max_history_id(self):
+        # No flush: reload_external_changes() asks straight after reading an
+        # edit, which writing out the old snapshot would overwrite. The
+        # collected changes are of reminders in memory, not the history.
+        return self.store.max_history_id()
+
+    def history_ids(self):
+        self.flush()
+        return self.store.history_ids()
+
+    def completed_older_than(self, timestamp):
+        self.flush()
+        return self.store.completed_older_than(timestamp)
+
+    def delete_completed_older_than(self, timestamp):
+        self.flush()
+        self.store.delete_completed_older_than(timestamp)
+
+    def watched_path(self):
+        return self.store.watched_path()
+
+    def reload_if_changed(self):
+        # No flush: that could overwrite the change before it is read
+        return self.store.reload_if_changed()
+
+    def local_changes(self):
+        return self.store.local_changes() | self.changes.keys()
+
+    def watched_ids(self):
+        return self.store.watched_ids()
+
+    def close(self):
+        self.flush()
+        self.store.close()
+
+    def flush(self):
+        """Write the collected changes to the wrapped store now"""
+        if not self.changes:
+            return
+        changes, self.changes = self.changes, {}
+        put = [reminder for reminder in changes.values() if reminder is not None]
+        deleted = [reminder_id for reminder_id, reminder in changes.items() if reminder is None]
+        start = time.perf_counter()
+        try:
+            if put:
+                self.store.put(put)
+            if deleted:
+                self.store.delete(deleted)
+        except Exception:
+            # Keep what failed for the next flush, unless changed again meanwhile
+            for reminder_id, reminder in changes.items():
+                self.changes.setdefault(reminder_id, reminder)
+            raise
+        if self.metrics is not None:
+            self.metrics.observe('reminder_save_seconds', time.perf_counter() - start)
+        writes = bool(put) + bool(deleted)
+        self.counters['writes'] += writes
+        self.counters['avoided'] = self.counters['changes'] - self.counters['writes']
+
+    def _changed(self):
+        self.counters['changes'] += 1
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.call_later(self.delay, self._flush_due)
+
+    def _flush_due(self):
+        self.flush_scheduled = False
+        try:
+            self.flush()
+        except OSError as e:
+            print(f"Could not save reminders, retrying in {self.delay} seconds: {e}", file=sys.stderr)
+            self.flush_scheduled = True
+            self.call_later(self.delay, self._flush_due)
+        return False  # Required for GLib.timeout_add
+
+class ReminderArchive:
+    """Append-only, gzip-compressed JSON-lines file of archived reminders
+
+    Every append adds one complete gzip member, which readers see as a
+    single continuous stream, so nothing already written is rewritten. A
+    member torn by a crash mid-append would end what can be read back, so
+    the first append cuts the file back to its last complete member.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._checked = False
+
+    def append(self, records):
+        """Add records to the end of the archive, returning how many"""
+        lines = [json.dumps(record, default=json_default) + "\n" for record in records]
+        if not lines:
+            return 0
+        data = gzip.compress("".join(lines).encode())
+        with self._lock, open(self.path, 'ab') as f:
+            if not self._checked:
+                self._truncate_torn(f)
+                self._checked = True
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(lines)
+
+    @staticmethod
+    def _truncate_torn(f):
+        """Cut f back to its last complete gzip member, so appends can be read again"""
+        size = os.fstat(f.fileno()).st_size
+        good = ReminderArchive._intact_length(f.name) if size else 0
+        if good < size:
+            print(f"Cutting torn data off the end of {f.name}", file=sys.stderr)
+            f.truncate(good)
+
+    @staticmethod
+    def _intact_length(path):
+        """Length of the complete gzip members at the start of path"""
+        good = offset = 0
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        with open(path, 'rb') as f:
+            for chunk in iter(functools.partial(f.read, 1024 * 1024), b""):
+                while chunk:
+                    try:
+                        decompressor.decompress(chunk)
+                    except zlib.error:
+                        return good
+                    if not decompressor.eof:
+                        offset += len(chunk)
+                        break
+                    # The member ended inside this chunk; the next one starts right after
+                    offset += len(chunk) - len(decompressor.unused_data)
+                    good = offset
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return good
+
+    def __iter__(self):
+        """Yield the archived records, oldest first"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with gzip.open(self.path, 'rt') as f:
+                for line in f:
+                    yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError):
+            return  # Torn final member
+
+# Named reminder lists, each with files of its own
+class ReminderList:
+    """One named list of reminders: its store, archive and in-memory records
+
+    The default list keeps its files directly in the configuration
+    directory, where all reminders lived before there were lists; every
+    other list has a directory of its own under lists/. Reminders of a
+    named list carry its name under 'list'.
+    """
+    
+    DEFAULT = "default"
+    NAME = re.compile(r"\w[\w-]*$")
+    
+    def __init__(self, name, directory, store, archive):
+        self.name = name
+        self.directory = directory
+        self.store = store
+        self.archive = archive
+        # Reminders of this list in memory, by id
+        self.reminders = {}
+        self.file_watcher = None
+    
+    @classmethod
+    def directory_for(cls, config_dir, name):
+        """Where the files of the named list live, rejecting names that are not plain words"""
+        if name == cls.DEFAULT:
+            return config_dir
+        if not cls.NAME.match(name):
+            raise ValueError(f"invalid list name {name!r}")
+        return os.path.join(config_dir, "lists", name)
+    
+    @classmethod
+    def names(cls, config_dir):
+        """The default list and every named list with a directory, sorted"""
+        try:
+            entries = os.listdir(os.path.join(config_dir, "lists"))
+        except FileNotFoundError:
+            entries = []
+        return [cls.DEFAULT] + sorted(name for name in entries if cls.NAME.match(name) and name != cls.DEFAULT)
+
+def migrate_json_to_sqlite(json_path, store):
+    """Copy reminders.json (and its journal) into a SqliteStore not yet migrated
+
+    The rows and the store's user_version are committed together, so a crash
+    part way leaves an empty, unmarked database that migrates on next start.
+    """
+    source = JournalStore(json_path, list)
+    try:
+        # load() only returns the pending reminders, the completed ones stay in the history
+        reminders = source.load() + list(source.history)
+    finally:
+        source.close()
+    if reminders:
+        # The id is the primary key here, so collisions must go first
+        ids = itertools.count(max(r['id'] for r in reminders) + 1)
+        dedupe_reminder_ids(reminders, ids.__next__)
+    store.put(reminders, user_version=store.MIGRATED_VERSION)
+    if reminders:
+        print(f"Migrated {len(reminders)} reminders from {json_path} to {store.db_path}", file=sys.stderr)
+
+STORAGE_BACKENDS = {
+    'journal': JournalStore,
+    'json': JsonFileStore,
+    'sqlite': SqliteStore,
+}
+
+def dedupe_reminder_ids(reminders, allocate, taken=()):
+    """Give every reminder sharing an earlier reminder's id, or one in taken, a fresh one
+
+    Returns the reminders that were renumbered. Ids used to be derived from
+    the creation second, so older files can contain collisions.
+    """
+    seen = set()
+    repaired = []
+    for reminder in reminders:
+        if reminder['id'] in seen or reminder['id'] in taken:
+            reminder['id'] = allocate()
+            repaired.append(reminder)
+        seen.add(reminder['id'])
+    return repaired
+
+class ReminderIdAllocator:
+    """Monotonic reminder ids that stay within a signed 32-bit integer
+
+    Ids are reserved from path in blocks, so the file is rewritten once per
+    block rather than once per reminder, and a restart resumes after the last
+    reserved block even if the newest reminders were deleted since. Past the
+    32-bit limit allocation wraps around to 1, skipping ids still in use.
+    """
+
+    MAX_ID = 2 ** 31 - 1
+    BLOCK_SIZE = 1024
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.reserved_from = self.reserved_until = 0
+        
+        self.next_id = 1
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.next_id = min(max(int(json.load(f)), 1), self.MAX_ID)
+            except (ValueError, TypeError):
+                pass
+
+    def observe(self, reminder_id):
+        """Make sure an existing id is never handed out again"""
+        with self._lock:
+            if reminder_id >= self.next_id:
+                self.next_id = self._after(reminder_id)
+
+    def allocate(self, in_use):
+        """Return a new id that is not a key of in_use"""
+        with self._lock:
+            candidate = self.next_id
+            while candidate in in_use:
+                candidate = self._after(candidate)
+            self.next_id = self._after(candidate)
+            
+            if not self.reserved_from <= candidate < self.reserved_until:
+                self.reserved_from = candidate
+                self.reserved_until = min(candidate + self.BLOCK_SIZE, self.MAX_ID)
+                atomic_write_json(self.path, self.reserved_until)
+            return candidate
+
+    def close(self):
+        """Record exactly where allocation stopped, so a clean restart skips nothing"""
+        with self._lock:
+            if self.reserved_until:
+                atomic_write_json(self.path, self.next_id)
+                self.reserved_from = self.reserved_until = 0
+
+    def _after(self, reminder_id):
+        return reminder_id + 1 if reminder_id < self.MAX_ID else 1
+
+class FireLog:
+    """Write-ahead log of the notifications for firing reminders
+
+    fire() appends an fsynced line before a reminder is notified about and
+    changed; shown() appends one once its notification is out. Replayed on
+    startup, an entry tells whether the notification still has to be shown
+    and at which trigger time the reminder fired, in case its own change
+    never reached the store. entries maps each reminder id to its list,
+    trigger time and whether it was shown. compact() rewrites the file with
+    only the entries still needed, so no line is ever rewritten in between.
+    """
+
+    # Lines appended before the app compacts the log
+    COMPACT_RECORDS = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self.entries = {}
+        self.records = 0
+        if os.path.exists(path):
+            with open(path, 'rb+') as f:
+                good = 0
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        # Torn write from a crash mid-append; cut it off so new lines can follow
+                        f.truncate(good)
+                        break
+                    self._apply(record)
+                    self.records += 1
+                    good += len(line)
+
+    def fire(self, reminder_id, trigger_time, name):
+        """Record that a reminder is about to be notified about"""
+        self._append({'fire': reminder_id, 'time': trigger_time, 'list': name})
+
+    def shown(self, reminder_ids):
+        """Record that the notification for reminders was shown, or deliberately dropped"""
+        reminder_ids = [
+            reminder_id for reminder_id in reminder_ids
+            if reminder_id in self.entries and not self.entries[reminder_id]['shown']
+        ]
+        if reminder_ids:
+            self._append({'shown': reminder_ids})
+
+    def compact(self, settled):
+        """Rewrite the log without the shown entries of the lists in settled
+
+        Only call this once those lists' stores hold every change made so
+        far; notifications still to be shown are always kept.
+        """
+        entries = {
+            reminder_id: entry for reminder_id, entry in self.entries.items()
+            if not (entry['shown'] and entry['list'] in settled)
+        }
+        lines = []
+        for reminder_id, entry in entries.items():
+            lines.append(json.dumps({'fire': reminder_id, 'time': entry['time'], 'list': entry['list']}) + "\n")
+            if entry['shown']:
+                lines.append(json.dumps({'shown': [reminder_id]}) + "\n")
+        
+        self.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.entries = entries
+        self.records = len(lines)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _append(self, record):
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._apply(record)
+        self.records += 1
+
+    def _apply(self, record):
+        if 'fire' in record:
+            self.entries[record['fire']] = {'time': record['time'], 'list': record['list'], 'shown': False}
+        else:
+            for reminder_id in record['shown']:
+                if reminder_id in self.entries:
+                    self.entries[reminder_id]['shown'] = True
+
+# Bulk import and export formats
+def batched(iterable, size):
+    """Yield lists of up to size items from iterable"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def parse_trigger_time(value):
+    """Turn a timestamp or an ISO 8601 date/time string into a timestamp"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value.strip()).timestamp()
+
+def normalize_reminder(item):
+    """Validate an imported record and return it as a reminder without an id"""
+    reminder = {k: v for k, v in item.items() if k != 'id'}
+    title = reminder.get('title')
+    if not title:
+        raise ValueError("missing title")
+    if reminder.get('trigger_time') in (None, ""):
+        raise ValueError(f"missing trigger_time for {title!r}")
+    
+    reminder['message'] = reminder.get('message') or ""
+    reminder['trigger_time'] = parse_trigger_time(reminder['trigger_time'])
+    triggered = reminder.get('triggered', False)
+    if isinstance(triggered, str):
+        triggered = triggered.strip().lower() in ("1", "true", "yes")
+    reminder['triggered'] = bool(triggered)
+    
+    # CSV leaves these empty for reminders that do not repeat
+    for key in ('recurrence_start', 'occurrence'):
+        if reminder.get(key) in (None, "") or not reminder.get('recurrence'):
+            reminder.pop(key, None)
+    if reminder.get('recurrence'):
+        reminder.setdefault('recurrence_start', reminder['trigger_time'])
+        reminder['recurrence_start'] = parse_trigger_time(reminder['recurrence_start'])
+        if 'occurrence' in reminder:
+            reminder['occurrence'] = int(reminder['occurrence'])
+        # A new series fires first where the rule first matches; one already
+        # under way carries its occurrence and current trigger time
+        if reminder.get('occurrence') is None:
+            first = first_occurrence(reminder['recurrence'], reminder['recurrence_start'])
+            if first is None:
+                raise ValueError(f"recurrence of {title!r} never occurs")
+            reminder['trigger_time'] = first
+    else:
+        reminder.pop('recurrence', None)
+    return reminder
+
+def read_jsonl(f):
+    """Yield reminder records from JSON lines"""
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+def read_csv(f):
+    """Yield reminder records from CSV with a title,message,trigger_time header"""
+    yield from csv.DictReader(f)
+
+ICS_DURATION = re.compile(
+    r"([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$"
+)
+
+def _ics_lines(f):
+    """Yield unfolded iCalendar content lines"""
+    current = None
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+def _ics_property(line):
+    """Split a content line into (NAME, {PARAM: value}, value)"""
+    in_quotes = False
+    for index, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            break
+    else:
+        return line.upper(), {}, ""
+    
+    name, *params = line[:index].split(";")
+    parameters = {}
+    for param in params:
+        key, _, value = param.partition("=")
+        parameters[key.upper()] = value.strip('"')
+    return name.upper(), parameters, line[index + 1:]
+
+def _ics_unescape(value):
+    return re.sub(r"\\([nN\\,;])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+def _ics_escape(value):
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+def _ics_datetime(params, value):
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.datetime.strptime(value, "%Y%m%d").timestamp()
+    if value.endswith("Z"):
+        moment = datetime.datetime.strptime(value, "%Y%m%dT%H%M%SZ")
+        return moment.replace(tzinfo=datetime.timezone.utc).timestamp()
+    
+    moment = datetime.datetime.strptime(value, "%Y%m%dT%H%M%S")
+    if 'TZID' in params:
+        try:
+            import zoneinfo
+            moment = moment.replace(tzinfo=zoneinfo.ZoneInfo(params['TZID']))
+        except (ImportError, ValueError, LookupError):
+            pass  # Unknown zone, treat as local time
+    return moment.timestamp()
+
+def _ics_duration(value):
+    match = ICS_DURATION.match(value.strip())
+    if not match:
+        raise ValueError(f"bad iCalendar duration {value!r}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    total = datetime.timedelta(
+        weeks=int(weeks or 0), days=int(days or 0),
+        hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0)
+    ).total_seconds()
+    return -total if sign == "-" else total
+
+def _ics_reminder(event, alarm):
+    if 'DTSTART' not in event:
+        raise ValueError("VEVENT without DTSTART")
+    start = _ics_datetime(*event['DTSTART'])
+    trigger_time = start
+    
+    if alarm and 'TRIGGER' in alarm:
+        params, value = alarm['TRIGGER']
+        if params.get('VALUE') == 'DATE-TIME':
+            trigger_time = _ics_datetime(params, value)
+        else:
+            base = start
+            if params.get('RELATED') == 'END' and 'DTEND' in event:
+                base = _ics_datetime(*event['DTEND'])
+            trigger_time = base + _ics_duration(value)
+    
+    reminder = {
+        'title': _ics_unescape(event.get('SUMMARY', ({}, ""))[1]),
+        'message': _ics_unescape(event.get('DESCRIPTION', ({}, ""))[1]),
+        'trigger_time': trigger_time,
+        'triggered': event.get('X-REMINDER-TRIGGERED', ({}, ""))[1].upper() == "TRUE",
+    }
+    recurrence = event.get('RRULE', event.get('X-REMINDER-CRON', ({}, "")))[1]
+    if recurrence:
+        reminder['recurrence'] = recurrence
+        reminder['recurrence_start'] = trigger_time
+        # Where our own export left a series that had already started
+        if 'X-REMINDER-TRIGGER-TIME' in event:
+            reminder['trigger_time'] = _ics_datetime(*event['X-REMINDER-TRIGGER-TIME'])
+        if 'X-REMINDER-OCCURRENCE' in event:
+            reminder['occurrence'] = int(event['X-REMINDER-OCCURRENCE'][1])
+    return reminder
+
+def read_ics(f):
+    """Yield a reminder record per VEVENT, triggered by its first VALARM"""
+    event = alarm = first_alarm = None
+    for line in _ics_lines(f):
+        name, params, value = _ics_property(line)
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event, first_alarm = {}, None
+        elif name == 'BEGIN' and value.upper() == 'VALARM' and event is not None:
+            alarm = {}
+        elif name == 'END' and value.upper() == 'VALARM':
+            if first_alarm is None:
+                first_alarm = alarm
+            alarm = None
+        elif name == 'END' and value.upper() == 'VEVENT' and event is not None:
+            yield _ics_reminder(event, first_alarm)
+            event = None
+        elif alarm is not None:
+            alarm[name] = (params, value)
+        elif event is not None:
+            event[name] = (params, value)
+
+def write_jsonl(reminders):
+    """Yield reminders as JSON lines"""
+    for reminder in reminders:
+        yield json.dumps(reminder, default=json_default) + "\n"
+
+def write_csv(reminders):
+    """Yield reminders as CSV rows, starting with a header"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    def take():
+        row = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return row
+    
+    def local_time(timestamp):
+        # With the UTC offset, so the file means the same time in any time zone
+        return datetime.datetime.fromtimestamp(float(timestamp)).astimezone().isoformat()
+    
+    writer.writerow(['id', 'title', 'message', 'trigger_time', 'triggered', 'recurrence',
+                     'recurrence_start', 'occurrence'])
+    yield take()
+    for reminder in reminders:
+        recurrence = reminder.get('recurrence')
+        writer.writerow([
+            reminder['id'],
+            reminder['title'],
+            reminder['message'],
+            local_time(reminder['trigger_time']),
+            reminder['triggered'],
+            recurrence or "",
+            local_time(reminder.get('recurrence_start', reminder['trigger_time'])) if recurrence else "",
+            reminder.get('occurrence', 1) if recurrence else ""
+        ])
+        yield take()
+
+def _ics_fold(line):
+    """Fold a content line at 75 characters as RFC 5545 requires"""
+    return "\r\n ".join(line[i:i + 74] for i in range(0, len(line), 74)) + "\r\n"
+
+def write_ics(reminders):
+    """Yield an iCalendar file with one VEVENT and display VALARM per reminder"""
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Reminder App//EN\r\n"
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    
+    def utc(timestamp):
+        moment = datetime.datetime.fromtimestamp(float(timestamp), datetime.timezone.utc)
+        return moment.strftime('%Y%m%dT%H%M%SZ')
+    
+    for reminder in reminders:
+        recurrence = reminder.get('recurrence')
+        # A series starts where it first did, however far it has got since
+        start = reminder.get('recurrence_start', reminder['trigger_time']) if recurrence else reminder['trigger_time']
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:reminder-{reminder['id']}@reminder-app",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{utc(start)}",
+            f"SUMMARY:{_ics_escape(reminder['title'])}",
+            f"DESCRIPTION:{_ics_escape(reminder['message'])}",
+            f"X-REMINDER-TRIGGERED:{'TRUE' if reminder['triggered'] else 'FALSE'}",
+        ]
+        if recurrence:
+            # Cron has no iCalendar equivalent; keep it for our own imports
+            if isinstance(parse_recurrence(recurrence), RRule):
+                lines.append(f"RRULE:{recurrence.upper().replace('RRULE:', '')}")
+            else:
+                lines.append(f"X-REMINDER-CRON:{recurrence}")
+            # So COUNT and the next trigger time survive a round trip
+            lines.append(f"X-REMINDER-TRIGGER-TIME:{utc(reminder['trigger_time'])}")
+            lines.append(f"X-REMINDER-OCCURRENCE:{reminder.get('occurrence', 1)}")
+        lines += [
+            "BEGIN:VALARM",
+            "ACTION:DISPLAY",
+            f"DESCRIPTION:{_ics_escape(reminder['title'])}",
+            "TRIGGER:PT0S",
+            "END:VALARM",
+            "END:VEVENT",
+        ]
+        yield "".join(_ics_fold(line) for line in lines)
+    yield "END:VCALENDAR\r\n"
+
+IMPORT_FORMATS = {
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+    'ics': read_ics,
+}
+
+EXPORT_FORMATS = {
+    'jsonl': write_jsonl,
+    'csv': write_csv,
+    'ics': write_ics,
+}
+
+def guess_format(path):
+    """Pick an import/export format from a file name"""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return {'json': 'jsonl', 'ical': 'ics', 'ifb': 'ics'}.get(extension, extension)
+
+# Recurrence rules, expanded one occurrence at a time
+class RecurrenceRule:
+    """A parsed recurrence rule
+
+    next_after() computes only the first occurrence after a given time, so
+    memory stays constant however long the series runs.
+    """
+
+    # Periods or steps to scan for a match before declaring the series over
+    SEARCH_LIMIT = 5000
+
+    def next_after(self, after, start):
+        """Return the first occurrence strictly after after, or None when the series ends
+
+        start is the trigger time of the first occurrence.
+        """
+        raise NotImplementedError
+
+class RRule(RecurrenceRule):
+    """The commonly used subset of iCalendar RRULE
+
+    Supports FREQ (MINUTELY to YEARLY), INTERVAL, BYDAY (plain weekdays),
+    BYMONTHDAY, BYMONTH, COUNT and UNTIL. Occurrences keep the local time of
+    day of the first one.
+    """
+
+    FREQUENCIES = ('MINUTELY', 'HOURLY', 'DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+    WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+    def __init__(self, text):
+        parts = {}
+        for part in text.upper().split(";"):
+            if part.strip():
+                key, _, value = part.partition("=")
+                parts[key.strip()] = value.strip()
+        
+        unsupported = set(parts) - {'FREQ', 'INTERVAL', 'BYDAY', 'BYMONTHDAY', 'BYMONTH', 'COUNT', 'UNTIL', 'WKST'}
+        if unsupported:
+            raise ValueError(f"unsupported RRULE parts: {', '.join(sorted(unsupported))}")
+        if parts.get('FREQ') not in self.FREQUENCIES:
+            raise ValueError(f"unsupported RRULE FREQ {parts.get('FREQ')!r}")
+        
+        self.freq = parts['FREQ']
+        self.interval = int(parts.get('INTERVAL', 1))
+        if self.interval < 1:
+            raise ValueError("RRULE INTERVAL must be positive")
+        self.byday = self._values(parts, 'BYDAY', self.WEEKDAYS.index)
+        self.bymonthday = self._values(parts, 'BYMONTHDAY', lambda v: self._in_range(v, 1, 31))
+        self.bymonth = self._values(parts, 'BYMONTH', lambda v: self._in_range(v, 1, 12))
+        self.count = int(parts['COUNT']) if 'COUNT' in parts else None
+        self.until = _ics_datetime({}, parts['UNTIL']) if 'UNTIL' in parts else None
+
+    @staticmethod
+    def _in_range(text, low, high):
+        value = int(text)
+        if not low <= value <= high:
+            raise ValueError(text)
+        return value
+
+    @staticmethod
+    def _values(parts, key, parse):
+        if key not in parts:
+            return ()
+        try:
+            return tuple(sorted({parse(item) for item in parts[key].split(",")}))
+        except ValueError:
+            raise ValueError(f"unsupported RRULE {key} value {parts[key]!r}") from None
+
+    def next_after(self, after, start):
+        occurrence = self._search(
+            datetime.datetime.fromtimestamp(max(after, start - 1)),
+            datetime.datetime.fromtimestamp(start)
+        )
+        if occurrence is None:
+            return None
+        timestamp = occurrence.timestamp()
+        if self.until is not None and timestamp > self.until:
+            return None
+        return timestamp
+
+    def _matches(self, moment):
+        return (
+            (not self.byday or moment.weekday() in self.byday)
+            and (not self.bymonthday or moment.day in self.bymonthday)
+            and (not self.bymonth or moment.month in self.bymonth)
+        )
+
+    def _search(self, after, start):
+        if self.freq in ('MINUTELY', 'HOURLY'):
+            step = datetime.timedelta(minutes=self.interval) if self.freq == 'MINUTELY' \
+                else datetime.timedelta(hours=self.interval)
+            moment = start + step * ((after - start) // step + 1)
+            for _ in range(self.SEARCH_LIMIT):
+                if self._matches(moment):
+                    return moment
+                moment += step
+            return None
+        
+        # Date based rules: walk whole periods from the one containing after
+        for period in range(self._period_of(after, start), self._period_of(after, start) + self.SEARCH_LIMIT):
+            for day in self._days_in_period(period, start):
+                moment = datetime.datetime.combine(day, start.time())
+                if moment > after and moment >= start and self._matches(moment):
+                    return moment
+        return None
+
+    def _period_of(self, moment, start):
+        if self.freq == 'DAILY':
+            elapsed = (moment.date() - start.date()).days
+        elif self.freq == 'WEEKLY':
+            elapsed = (moment.date() - start.date() + datetime.timedelta(days=start.weekday() - moment.weekday())).days // 7
+        elif self.freq == 'MONTHLY':
+            elapsed = (moment.year - start.year) * 12 + moment.month - start.month
+        else:
+            elapsed = moment.year - start.year
+        return max(elapsed // self.interval, 0)
+
+    def _days_in_period(self, period, start):
+        offset = period * self.interval
+        if self.freq == 'DAILY':
+            return [start.date() + datetime.timedelta(days=offset)]
+        if self.freq == 'WEEKLY':
+            monday = start.date() - datetime.timedelta(days=start.weekday()) + datetime.timedelta(weeks=offset)
+            return [monday + datetime.timedelta(days=d) for d in (self.byday or (start.weekday(),))]
+        if self.freq == 'MONTHLY':
+            year, month = divmod(start.year * 12 + start.month - 1 + offset, 12)
+            return self._days_in_month(year, month + 1, start)
+        months = self.bymonth or (start.month,)
+        return [day for month in months for day in self._days_in_month(start.year + offset, month, start)]
+
+    def _days_in_month(self, year, month, start):
+        if year > datetime.MAXYEAR:
+            return []
+        last = (datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)).day
+        if self.bymonthday:
+            days = [d for d in self.bymonthday if d <= last]
+        elif self.byday:
+            days = range(1, last + 1)  # Filtered by weekday in _matches
+        else:
+            # Months without the start's day are skipped, as in RFC 5545
+            days = [start.day] if start.day <= last else []
+        return [datetime.date(year, month, d) for d in days]
+
+class CronRule(RecurrenceRule):
+    """A five-field cron expression: minute hour day-of-month month day-of-week"""
+
+    FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+    NAMES = {
+        3: ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'),
+        4: ('SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT'),
+    }
+    MACROS = {
+        '@hourly': "0 * * * *",
+        '@daily': "0 0 * * *",
+        '@midnight': "0 0 * * *",
+        '@weekly': "0 0 * * 0",
+        '@monthly': "0 0 1 * *",
+        '@yearly': "0 0 1 1 *",
+        '@annually': "0 0 1 1 *",
+    }
+
+    def __init__(self, text):
+        fields = self.MACROS.get(text.strip().lower(), text).split()
+        if len(fields) != 5:
+            raise ValueError(f"cron expressions need 5 fields, got {text!r}")
+        
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse_field(index, field) for index, field in enumerate(fields)
+        )
+        # Cron counts Sunday as 0 or 7, datetime as 6
+        self.weekdays = frozenset((d - 1) % 7 for d in weekdays)
+        # Restricting both day fields matches either, as in cron
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _parse_field(self, index, field):
+        low, high = self.FIELDS[index]
+        names = self.NAMES.get(index, ())
+        
+        def value(text):
+            if text.upper() in names:
+                return names.index(text.upper()) + (1 if index == 3 else 0)
+            number = int(text)
+            if not low <= number <= high:
+                raise ValueError(f"cron value {number} out of range {low}-{high}")
+            return number
+        
+        values = set()
+        for item in field.split(","):
+            item, _, step = item.partition("/")
+            if item == "*":
+                first, last = low, high
+            elif "-" in item:
+                first, last = (value(part) for part in item.split("-", 1))
+            else:
+                first = last = value(item)
+                if step:
+                    last = high
+            values.update(range(first, last + 1, int(step) if step else 1))
+        return frozenset(values)
+
+    def _day_matches(self, moment):
+        in_days = moment.day in self.days
+        in_weekdays = moment.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, after, start):
+        moment = datetime.datetime.fromtimestamp(max(after, start - 1)).replace(second=0, microsecond=0)
+        moment += datetime.timedelta(minutes=1)
+        for _ in range(self.SEARCH_LIMIT):
+            if moment.month not in self.months:
+                year, month = divmod(moment.year * 12 + moment.month, 12)
+                moment = datetime.datetime(year, month + 1, 1)
+            elif not self._day_matches(moment):
+                moment = datetime.datetime.combine(moment.date() + datetime.timedelta(days=1), datetime.time())
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += datetime.timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        return None
+
+@functools.lru_cache(maxsize=256)
+def parse_recurrence(rule):
+    """Parse an RRULE (with or without the RRULE: prefix) or a cron expression"""
+    text = rule.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[len("RRULE:"):]
+    if "FREQ=" in text.upper():
+        return RRule(text)
+    return CronRule(text)
+
+def next_occurrence(reminder, after):
+    """Return the next trigger time of a recurring reminder after a time, or None"""
+    rule = parse_recurrence(reminder['recurrence'])
+    # COUNT limits how often the reminder fires
+    if isinstance(rule, RRule) and rule.count is not None and reminder.get('occurrence', 1) >= rule.count:
+        return None
+    return rule.next_after(after, reminder.get('recurrence_start', reminder['trigger_time']))
+
+def first_occurrence(recurrence, start):
+    """Return the first trigger time of a rule at or after start, or None if there is none
+
+    start is the series' DTSTART: it is the first occurrence if the rule
+    matches it, as RFC 5545 has it, and otherwise only anchors the series.
+    """
+    trigger_time = parse_recurrence(recurrence).next_after(start - 1, start)
+    if trigger_time is None:
+        return None
+    # A match at start itself comes back through datetime, maybe a hair off
+    return start if abs(trigger_time - start) < 1e-3 else trigger_time
+
+@functools.lru_cache(maxsize=1024)
+def _upcoming(rule, start, trigger_time, occurrence, count):
+    reminder = {
+        'recurrence': rule,
+        'recurrence_start': start,
+        'trigger_time': trigger_time,
+        'occurrence': occurrence,
+    }
+    times = [trigger_time]
+    while len(times) < count:
+        following = next_occurrence(reminder, times[-1])
+        if following is None:
+            break
+        reminder['occurrence'] += 1
+        times.append(following)
+    return tuple(times)
+
+def upcoming_occurrences(reminder, count):
+    """Return up to count upcoming trigger times of a pending reminder, cached"""
+    if reminder['triggered']:
+        return ()
+    if not reminder.get('recurrence'):
+        return (float(reminder['trigger_time']),)
+    return _upcoming(
+        reminder['recurrence'],
+        float(reminder.get('recurrence_start', reminder['trigger_time'])),
+        float(reminder['trigger_time']),
+        reminder.get('occurrence', 1),
+        count
+    )
+
+# Priority queue of pending reminders driving the checker thread
+class ReminderScheduler:
+    """Min-heaps of pending reminders keyed on trigger time, one per list
+
+    The checker thread sleeps until the earliest reminder is due instead of
+    polling, and is only woken early when a push or discard changes it.
+    Every reminder list has a heap of its own, and a heap of the lists'
+    next due times sits on top, so finding what is due costs O(log lists)
+    plus the work inside the lists that are due. A list that is not loaded
+    can take part by its next due time alone, see expect(). Discarded
+    entries are invalidated in place and dropped lazily.
+
+    Waits are measured on the monotonic clock, which stands still during
+    suspend and ignores the wall clock being set, so the checker relies on
+    resumed() and clock_changed() to wake it. Every wakeup compares how far
+    the wall and monotonic clocks moved. A difference beyond
+    CLOCK_JUMP_THRESHOLD means the machine slept or the clock was stepped,
+    and the next due reminders are handed over as one catch-up batch, as
+    are those due at startup and after resumed(). Where nothing reports
+    resumes or clock changes, set check_interval to cap the waits instead.
+    """
+
+    # Cap on waits for when nothing reports resumes or clock changes
+    CLOCK_CHECK_INTERVAL = 60
+    CLOCK_JUMP_THRESHOLD = 5
+
+    def __init__(self):
+        self._heaps = {}  # list name -> heap of [trigger time, tie-breaker, reminder]
+        self._entries = {}  # id(reminder) -> heap entry
+        self._heads = []  # heap of [next due time, tie-breaker, list name]
+        self._head_entries = {}  # list name -> its live entry in _heads
+        self._expected = {}  # list name -> next due time of a list not loaded
+        self._counter = itertools.count()  # tie-breaker for equal trigger times
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._resumed = False
+        self._invalid = 0
+        # Longest wait between looks at the clocks in seconds, or None to wait as long as needed
+        self.check_interval = None
+        # Passes of the checker loop, for the metrics
+        self.wakeups = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def push(self, reminder):
+        """Schedule a reminder, replacing any earlier entry for it"""
+        with self._lock:
+            self._invalidate(reminder)
+            name = reminder_list_name(reminder)
+            entry = [reminder.trigger_time, next(self._counter), reminder]
+            self._entries[id(reminder)] = entry
+            heapq.heappush(self._heaps.setdefault(name, []), entry)
+            self._update_head(name)
+
+    def push_many(self, reminders):
+        """Schedule several reminders with at most one wakeup of the checker per list"""
+        with self._lock:
+            batches = {}
+            for reminder in reminders:
+                self._invalidate(reminder)
+                entry = [reminder.trigger_time, next(self._counter), reminder]
+                self._entries[id(reminder)] = entry
+                batches.setdefault(reminder_list_name(reminder), []).append(entry)
+            for name, entries in batches.items():
+                heap = self._heaps.setdefault(name, [])
+                # Heapifying is linear, cheaper than pushing a batch larger than the heap
+                if len(entries) > len(heap):
+                    heap.extend(entries)
+                    heapq.heapify(heap)
+                else:
+                    for entry in entries:
+                        heapq.heappush(heap, entry)
+                self._update_head(name)
+
+    def discard(self, reminder):
+        """Unschedule a reminder if it is still pending"""
+        with self._lock:
+            self._invalidate(reminder)
+
+    def expect(self, name, due_time):
+        """Stand in for a list that is not loaded by its next due time, or stop with None
+
+        run() hands the list's name to open_list once that time comes.
+        """
+        with self._lock:
+            if due_time is None:
+                self._expected.pop(name, None)
+            else:
+                self._expected[name] = due_time
+            self._update_head(name)
+
+    def next_due_time(self, name=None):
+        """Return the earliest trigger time of all lists, or of the named one, or None"""
+        with self._lock:
+            if name is not None:
+                entry = self._head_entries.get(name)
+                return entry[0] if entry is not None else None
+            self._drop_invalid_head()
+            return self._heads[0][0] if self._heads else None
+
+    def resumed(self):
+        """Wake the checker for a catch-up pass after the system resumed"""
+        with self._lock:
+            self._resumed = True
+            self._wakeup.set()
+
+    def clock_changed(self):
+        """Wake the checker to measure its wait again after the wall clock was set"""
+        with self._lock:
+            self._wakeup.set()
+
+    def stop(self):
+        """Make run() return as soon as possible"""
+        with self._lock:
+            self._stopped = True
+            self._wakeup.set()
+
+    def run(self, fire, catch_up=None, open_list=None):
+        """Call fire(reminder) for every reminder as it comes due until stopped
+
+        If given, catch_up(reminders) instead gets the reminders found due
+        at startup, after resumed() or after a clock jump, all at once.
+        open_list(name) is called for a list given to expect() once it is
+        due; it should load the list and push its reminders.
+        """
+        catching_up = catch_up is not None
+        wall, monotonic = time.time(), time.monotonic()
+        while True:
+            # Both clocks advance together unless the machine slept or the clock was set
+            jump = (time.time() - wall) - (time.monotonic() - monotonic)
+            wall, monotonic = time.time(), time.monotonic()
+            with self._lock:
+                if self._stopped:
+                    return
+                self.wakeups += 1
+                self._wakeup.clear()
+                if (self._resumed or abs(jump) > self.CLOCK_JUMP_THRESHOLD) and catch_up is not None:
+                    catching_up = True
+                self._resumed = False
+                due, lists = self._pop_due(wall)
+                self._drop_invalid_head()
+                timeout = self._heads[0][0] - wall if self._heads else None
+                if timeout is not None and self.check_interval is not None:
+                    timeout = min(timeout, self.check_interval)
+
+            if open_list is not None:
+                for name in lists:
+                    open_list(name)
+            if due and catching_up:
+                catch_up(due)
+            else:
+                for reminder in due:
+                    fire(reminder)
+            catching_up = False
+
+            # Nothing pending means no timeout at all: sleep until a push
+            if not due and not lists:
+                self._wakeup.wait(timeout)
+
+    def _pop_due(self, now):
+        """Take the due reminders, in trigger order, and the names of the expected lists now due"""
+        due = []
+        lists = []
+        while True:
+            self._drop_invalid_head()
+            if not self._heads or self._heads[0][0] > now:
+                break
+            name = self._heads[0][2]
+            expected = self._expected.get(name)
+            if expected is not None and expected <= now:
+                del self._expected[name]
+                lists.append(name)
+            heap = self._heaps.get(name, [])
+            while heap and heap[0][0] <= now:
+                entry = heapq.heappop(heap)
+                if entry[2] is None:
+                    self._invalid -= 1
+                    continue
+                del self._entries[id(entry[2])]
+                due.append(entry)
+            self._update_head(name, wake=False)
+        # Lists take turns above, so restore the overall order
+        if len(due) > 1:
+            due.sort()
+        return [entry[2] for entry in due], lists
+
+    def _update_head(self, name, wake=True):
+        """Bring the list's entry among the heads up to date, waking the checker if the earliest changed"""
+        heap = self._heaps.get(name)
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+            self._invalid -= 1
+        due = heap[0][0] if heap else None
+        expected = self._expected.get(name)
+        if expected is not None and (due is None or expected < due):
+            due = expected
+
+        entry = self._head_entries.get(name)
+        if entry is not None and entry[0] == due:
+            return
+        was_first = bool(self._heads) and self._heads[0] is entry
+        if entry is not None:
+            entry[2] = None
+            del self._head_entries[name]
+        if due is not None:
+            entry = [due, next(self._counter), name]
+            self._head_entries[name] = entry
+            heapq.heappush(self._heads, entry)
+
+        # Dead heads are at most one per head change; drop them once they dominate
+        if len(self._heads) > 2 * len(self._head_entries) + 8:
+            self._heads = [e for e in self._heads if e[2] is not None]
+            heapq.heapify(self._heads)
+        if wake and (was_first or (self._heads and self._heads[0] is entry)):
+            self._wakeup.set()
+
+    def _drop_invalid_head(self):
+        while self._heads and self._heads[0][2] is None:
+            heapq.heappop(self._heads)
+
+    def _invalidate(self, reminder):
+        entry = self._entries.pop(id(reminder), None)
+        if entry is None:
+            return
+        name = reminder_list_name(reminder)
+        was_head = self._heaps[name][0] is entry
+        entry[2] = None
+        self._invalid += 1
+
+        # Rebuild once dead entries dominate so memory stays O(pending)
+        if self._invalid > len(self._entries):
+            for heap in self._heaps.values():
+                heap[:] = [e for e in heap if e[2] is not None]
+                heapq.heapify(heap)
+            self._invalid = 0
+
+        if was_head:
+            self._update_head(name)
+
+# Suspend and resume notifications from systemd-logind
+class SleepMonitor:
+    """Calls on_resume() on the main loop after the system wakes up
+
+    This base class does not listen to anything and stands in when there
+    is no logind, or in tests: call prepare_for_sleep() like logind would.
+    """
+    
+    def __init__(self, on_resume):
+        self.on_resume = on_resume
+        self.sleeping = False
+        # False once it is clear that no resume will be reported
+        self.active = True
+    
+    def start(self):
+        pass
+    
+    def stop(self):
+        pass
+    
+    def prepare_for_sleep(self, sleeping):
+        """Handle logind's PrepareForSleep(true) before suspend and (false) after"""
+        was_sleeping, self.sleeping = self.sleeping, sleeping
+        if was_sleeping and not sleeping:
+            self.on_resume()
+
+class LogindSleepMonitor(SleepMonitor):
+    """Listens for PrepareForSleep on the system bus"""
+    
+    def __init__(self, on_resume):
+        super().__init__(on_resume)
+        self.bus = None
+        self.subscription = None
+    
+    def start(self):
+        require_gi()
+        try:
+            self.bus = Gio.bus_get_sync(Gio.BusType.SYSTEM, None)
+        except GLib.Error:
+            # Resumes are then caught as clock jumps when the scheduler next looks
+            self.active = False
+            return
+        self.subscription = self.bus.signal_subscribe(
+            "org.freedesktop.login1",
+            "org.freedesktop.login1.Manager",
+            "PrepareForSleep",
+            "/org/freedesktop/login1",
+            None,
+            Gio.DBusSignalFlags.NONE,
+            self.on_signal
+        )
+    
+    def stop(self):
+        if self.subscription is not None:
+            self.bus.signal_unsubscribe(self.subscription)
+            self.subscription = None
+    
+    def on_signal(self, connection, sender, path, interface, signal, parameters):
+        self.prepare_for_sleep(parameters.unpack()[0])
+
+class ClockMonitor:
+    """Calls on_change() after the wall clock was set, e.g. by NTP or the user
+
+    on_change may be called from any thread. This base class does not
+    watch anything and stands in where the clock cannot be watched, or in
+    tests: call clock_set() like a monitor would.
+    """
+    
+    def __init__(self, on_change):
+        self.on_change = on_change
+        # False once it is clear that no clock change will be reported
+        self.active = True
+    
+    def start(self):
+        pass
+    
+    def stop(self):
+        pass
+    
+    def clock_set(self):
+        self.on_change()
+
+class TimerfdClockMonitor(ClockMonitor):
+    """Watches a Linux timerfd that setting the wall clock cancels
+
+    The timer is armed on CLOCK_REALTIME at an absolute time a year ahead
+    with TFD_TIMER_CANCEL_ON_SET. Setting the clock cancels it, which makes
+    the descriptor readable and the read fail with ECANCELED. The GLib main
+    loop watches the descriptor, so nothing wakes up until that happens.
+    """
+    
+    CLOCK_REALTIME = 0
+    TFD_CLOEXEC = 0o2000000
+    TFD_NONBLOCK = 0o4000
+    TFD_TIMER_ABSTIME = 1
+    TFD_TIMER_CANCEL_ON_SET = 2
+    # Timer expiries between re-arms, in seconds; the expiry itself is harmless
+    ARM_AHEAD = 365 * 86400
+    
+    def __init__(self, on_change):
+        super().__init__(on_change)
+        self.fd = None
+        self.source = None
+        # timerfd_settime(fd, flags, itimerspec) and errno, bound once ctypes is loaded
+        self._settime = None
+        self._errno = None
+    
+    def start(self):
+        require_gi()
+        # Only needed here, so startup does not pay for it
+        import ctypes
+        import ctypes.util
+        
+        class Timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+        
+        class Itimerspec(ctypes.Structure):
+            _fields_ = [('it_interval', Timespec), ('it_value', Timespec)]
+        
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            create, settime = libc.timerfd_create, libc.timerfd_settime
+        except (OSError, AttributeError):
+            self.active = False
+            return
+        fd = create(self.CLOCK_REALTIME, self.TFD_CLOEXEC | self.TFD_NONBLOCK)
+        if fd < 0:
+            self.active = False
+            return
+        self.fd = fd
+        spec = Itimerspec()
+        
+        def set_timer(flags, seconds):
+            spec.it_value.tv_sec = seconds
+            return settime(fd, flags, ctypes.byref(spec), None)
+        
+        self._settime = set_timer
+        self._errno = ctypes.get_errno
+        if not self.arm():
+            self.stop()
+            self.active = False
+            return
+        self.source = GLib.unix_fd_add_full(GLib.PRIORITY_DEFAULT, fd, GLib.IOCondition.IN, self.on_ready)
+    
+    def stop(self):
+        if self.source is not None:
+            GLib.source_remove(self.source)
+            self.source = None
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+    
+    def arm(self):
+        """Set the timer ARM_AHEAD from now, cancelled if the clock is set; return whether it worked"""
+        flags = self.TFD_TIMER_ABSTIME | self.TFD_TIMER_CANCEL_ON_SET
+        if self._settime(flags, int(time.time()) + self.ARM_AHEAD) == 0:
+            return True
+        print(f"Not watching for clock changes: {os.strerror(self._errno())}", file=sys.stderr)
+        return False
+    
+    def on_ready(self, fd, condition):
+        try:
+            os.read(fd, 8)
+        except BlockingIOError:
+            return True  # Keep watching
+        except OSError as e:
+            if e.errno != errno.ECANCELED:
+                raise
+            self.on_change()
+        # Cancelled or expired, the timer has to be armed again
+        if not self.arm():
+            self.source = None
+            self.stop()
+            self.active = False
+            return False  # Stop watching
+        return True  # Keep watching
+
+# Noticing edits made to the reminders file by other programs
+class FileWatcher:
+    """Calls on_change() on the main loop once events for a file settle
+
+    Events less than delay seconds apart count as one, so an editor's
+    write, rename and attribute change cost a single check. This base
+    class does not watch anything and stands in when there is no file
+    monitor, or in tests: call changed() like a monitor would.
+    """
+    
+    def __init__(self, path, on_change, call_later, delay=0.5):
+        self.path = path
+        self.on_change = on_change
+        self.call_later = call_later
+        self.delay = delay
+        self.last_event = None
+        self.check_scheduled = False
+    
+    def start(self):
+        pass
+    
+    def stop(self):
+        pass
+    
+    def changed(self):
+        """Note an event for the file; call on the main loop"""
+        self.last_event = time.monotonic()
+        if not self.check_scheduled:
+            self.check_scheduled = True
+            self.call_later(self.delay, self.check)
+    
+    def check(self):
+        quiet = time.monotonic() - self.last_event
+        if quiet < self.delay:
+            self.call_later(self.delay - quiet, self.check)
+        else:
+            self.check_scheduled = False
+            self.on_change()
+        return False  # Required for GLib.timeout_add
+
+class GioFileWatcher(FileWatcher):
+    """Listens for changes to the file through a Gio.FileMonitor"""
+    
+    def __init__(self, path, on_change, call_later, delay=0.5):
+        super().__init__(path, on_change, call_later, delay)
+        self.monitor = None
+    
+    def start(self):
+        require_gi()
+        try:
+            # Also reports files renamed over this one, as atomic saves do
+            self.monitor = Gio.File.new_for_path(self.path).monitor_file(Gio.FileMonitorFlags.WATCH_MOVES, None)
+        except GLib.Error as e:
+            print(f"Not watching {self.path} for changes: {e.message}", file=sys.stderr)
+            return
+        self.monitor.connect("changed", self.on_event)
+    
+    def stop(self):
+        if self.monitor is not None:
+            self.monitor.cancel()
+            self.monitor = None
+    
+    def on_event(self, monitor, file, other_file, event_type):
+        self.changed()
+
+# Batching between due reminders and the notification daemon
+class NotificationDispatcher:
+    """Turn due reminders into as few notifications as possible
+
+    Runs on the main loop. Reminders submitted within window seconds of the
+    first one are shown together as one summary notification, and at most
+    rate notifications are shown per minute; while the limit holds, new
+    reminders keep joining the waiting batch. At most max_queue reminders
+    wait at once. Beyond that the overflow policy "summary" only counts
+    them into the next summary, while "drop" discards them. If given,
+    delivered(reminder_ids) hears about every reminder once it has been
+    shown or dropped.
+    """
+    
+    # Reminder titles listed in a summary notification
+    SUMMARY_TITLES = 5
+    OVERFLOW_POLICIES = ("summary", "drop")
+    
+    def __init__(self, show, call_later, window=2.0, rate=10, max_queue=50, overflow="summary", metrics=None,
+                 delivered=None):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy {overflow!r}")
+        # show(title, message, summary, reminder_ids) displays one notification
+        self.show = show
+        # call_later(delay, func) runs func on the main loop after delay seconds
+        self.call_later = call_later
+        # ServiceMetrics to record the fire lag in, or None
+        self.metrics = metrics
+        self.delivered = delivered
+        self.window = window
+        self.rate = rate
+        self.max_queue = max_queue
+        self.overflow = overflow
+        
+        self.pending = []
+        # Ids of the reminders only counted into the next summary
+        self.overflowed = []
+        self.flush_scheduled = False
+        
+        # Token bucket allowing bursts of up to rate notifications
+        self.tokens = float(rate)
+        self.refilled = time.monotonic()
+        
+        self.counters = {'queued': 0, 'sent': 0, 'coalesced': 0, 'dropped': 0, 'failed': 0}
+    
+    def submit(self, reminder):
+        """Queue a due reminder for the next notification"""
+        if len(self.pending) >= self.max_queue:
+            if self.overflow == "drop":
+                self.counters['dropped'] += 1
+                if self.delivered is not None:
+                    self.delivered((reminder['id'],))
+                return
+            self.overflowed.append(reminder['id'])
+        else:
+            self.pending.append((reminder['title'], reminder['message'], reminder['trigger_time'], reminder['id']))
+        self.counters['queued'] += 1
+        self.schedule_flush(self.window)
+    
+    def schedule_flush(self, delay):
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.call_later(delay, self.flush)
+    
+    def take_token(self):
+        """Use up one notification of the rate limit, or return the seconds until one is free"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.refilled) * self.rate / 60)
+        self.refilled = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) * 60 / self.rate
+    
+    def flush(self):
+        """Show the waiting reminders as one notification"""
+        self.flush_scheduled = False
+        if not self.pending and not self.overflowed:
+            return False
+        
+        wait = self.take_token()
+        if wait:
+            self.schedule_flush(wait)
+            return False
+        
+        batch, self.pending = self.pending, []
+        reminder_ids = tuple(reminder_id for _, _, _, reminder_id in batch) + tuple(self.overflowed)
+        count = len(reminder_ids)
+        self.overflowed = []
+        
+        if count == 1:
+            title, message, _, _ = batch[0]
+        else:
+            title = f"{count} reminders due"
+            lines = [name for name, _, _, _ in batch[:self.SUMMARY_TITLES]]
+            if count > len(lines):
+                lines.append(f"and {count - len(lines)} more")
+            message = "\n".join(lines)
+            self.counters['coalesced'] += count
+        
+        try:
+            self.show(title, message, count > 1, reminder_ids)
+        except Exception as e:
+            # Whatever broke the notification daemon, later batches still get their chance
+            self.counters['failed'] += 1
+            print(f"Could not show notification: {e}", file=sys.stderr)
+            return False
+        self.counters['sent'] += 1
+        if self.delivered is not None:
+            self.delivered(reminder_ids)
+        
+        if self.metrics is not None:
+            now = time.time()
+            for _, _, trigger_time, _ in batch:
+                self.metrics.observe('reminder_fire_lag_seconds', now - trigger_time)
+        return False  # Required for GLib.timeout_add
+
+# Opt-in metrics of the running service, in the Prometheus text format
+class Histogram:
+    """Counts of observed values per bucket, plus their sum"""
+    
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        # The last count is for values above every bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+class ServiceMetrics:
+    """Histograms filled in on the hot paths, and gauges read when rendered
+
+    A gauge is a callable, so it costs nothing until the metrics are
+    rendered. The gauges read state owned by the main loop, so publish()
+    renders there and other threads only serve the published text.
+    Processes running without metrics have None instead of an instance,
+    and only pay for that check.
+    """
+    
+    SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+    LAG_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 3600)
+    
+    def __init__(self):
+        self.histograms = {}
+        self.gauges = {}
+        # Text of the last publish(), for threads that must not read the gauges
+        self.published = ""
+    
+    def add_histogram(self, name, help, buckets=SECONDS_BUCKETS):
+        self.histograms[name] = (help, Histogram(buckets))
+    
+    def add_gauge(self, name, help, read, kind="gauge"):
+        """Report read() under name; kind "counter" is for totals that only grow"""
+        self.gauges[name] = (help, kind, read)
+    
+    def observe(self, name, value):
+        self.histograms[name][1].observe(value)
+    
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        for name, (help, kind, read) in self.gauges.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {read()}")
+        for name, (help, histogram) in self.histograms.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            cumulative += histogram.counts[-1]
+            lines.append(f'{name}_bucket{{le="+Inf"}} {cumulative}')
+            lines.append(f"{name}_sum {histogram.sum}")
+            lines.append(f"{name}_count {cumulative}")
+        return "\n".join(lines) + "\n"
+    
+    def publish(self):
+        """Render now, on the thread owning the gauges' state, and keep the text for other threads"""
+        self.published = self.render()
+        return self.published
+
+class MetricsRequestHandler(socketserver.StreamRequestHandler):
+    """Answer a plain HTTP GET of / or /metrics with the last published metrics"""
+    
+    def handle(self):
+        request = self.rfile.readline(65537).split()
+        # The headers do not matter
+        while self.rfile.readline(65537) not in (b"\r\n", b"\n", b""):
+            pass
+        
+        if len(request) < 2 or request[0] != b"GET":
+            status, body = "405 Method Not Allowed", b""
+        elif request[1].split(b"?")[0] not in (b"/", b"/metrics"):
+            status, body = "404 Not Found", b""
+        else:
+            status, body = "200 OK", self.server.metrics.published.encode()
+        self.wfile.write(
+            f"HTTP/1.0 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+
+class MetricsServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """HTTP endpoint for the metrics, only reachable from this machine"""
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, port, metrics):
+        self.metrics = metrics
+        super().__init__(("127.0.0.1", port), MetricsRequestHandler)
+
+# Base application class that handles reminders in both GUI and background modes
+class ReminderAppBase:
+    """Owner of the reminder state
+
+    Reminder state is only ever changed on the main loop thread. The
+    checker thread just decides when reminders are due and hands them over
+    through due_queue; other threads use run_on_main_loop().
+    """
+    
+    # Reminders committed per store write by add_reminders
+    IMPORT_BATCH_SIZE = 1000
+    
+    # What to do with reminders that came due while asleep, see catch_up_reminders
+    CATCH_UP_POLICIES = ("all", "latest", "missed")
+    # Reminders this late in a catch-up pass count as overdue
+    CATCH_UP_GRACE = 60
+    
+    # How often completed reminders are checked for archiving, in seconds
+    ARCHIVE_INTERVAL = 3600
+    # How long completed reminders stay in memory when nothing archives them, in seconds
+    RECENT_COMPLETED = 30 * 86400
+    
+    # Which side wins when the reminders file is edited elsewhere, see reload_external_changes
+    CONFLICT_POLICIES = ("local", "external")
+    
+    # How often the metrics file is rewritten and the main loop lag sampled, in seconds
+    METRICS_INTERVAL = 15
+    
+    # Buttons on reminder notifications, see on_notification_action
+    SNOOZE_MINUTES = (5, 15, 60)
+    NOTIFICATION_ACTIONS = tuple(
+        (f"snooze-{minutes}", f"Snooze {minutes} min") for minutes in SNOOZE_MINUTES
+    ) + (("done", "Done"),)
+    # Reason given in the notification spec's NotificationClosed signal
+    DISMISSED_BY_USER = 2
+    
+    def __init__(self, start_checker=True, storage="journal", notify_options=None, catch_up="all",
+                 archive_after=30 * 86400, write_delay=1.0, on_conflict="local",
+                 metrics_port=None, metrics_file=False, reminder_list=ReminderList.DEFAULT,
+                 escalation=(5 * 60, 15 * 60, 60 * 60)):
+        if catch_up not in self.CATCH_UP_POLICIES:
+            raise ValueError(f"unknown catch-up policy {catch_up!r}")
+        if on_conflict not in self.CONFLICT_POLICIES:
+            raise ValueError(f"unknown conflict policy {on_conflict!r}")
+        self.catch_up_policy = catch_up
+        self.conflict_policy = on_conflict
+        # Seconds after which completed reminders move to the archive, or None
+        self.archive_after = archive_after
+        # Seconds after each notification a reminder nobody acknowledged is shown again
+        self.escalation = tuple(escalation or ())
+        
+        # Opt-in instrumentation of a process that fires reminders, see start_metrics()
+        self.metrics = None
+        if start_checker and (metrics_port or metrics_file):
+            self.metrics = ServiceMetrics()
+            self.metrics.add_histogram('reminder_load_seconds', "Time to load the reminders or merge an outside edit")
+            self.metrics.add_histogram('reminder_save_seconds', "Time to write changes to the store")
+            self.metrics.add_histogram('reminder_fire_lag_seconds', "Time from a reminder's due time to its notification",
+                                       ServiceMetrics.LAG_BUCKETS)
+            self.metrics.add_histogram('reminder_main_loop_lag_seconds', "How late main loop timers run")
+        self.metrics_server = None
+        self.metrics_path = os.path.join(default_config_dir(), "metrics.prom") if metrics_file else None
+        
+        # Notifications are only needed by a process that fires reminders
+        # Whether they can have buttons; reminders are only tracked as unacknowledged if so
+        self.notification_actions = False
+        if start_checker:
+            self.init_notifications()
+        self.dispatcher = NotificationDispatcher(self.show_notification, self.call_later, metrics=self.metrics,
+                                                 delivered=self.notification_delivered, **(notify_options or {}))
+        
+        # Due reminders on their way from the checker thread to the main loop
+        self.due_queue = queue.SimpleQueue()
+        self.due_lock = threading.Lock()
+        self.due_drain_scheduled = False
+        
+        # Path for storing reminders
+        self.config_dir = default_config_dir()
+        self.storage = storage
+        # Batch writes in a process with a main loop to flush them; one-shot
+        # command line use writes every change straight away
+        self.write_delay = write_delay if start_checker else 0
+        
+        # Create config directory if it doesn't exist
+        os.makedirs(self.config_dir, exist_ok=True)
+        
+        # Callbacks told about every added, updated or removed reminder
+        self.change_listeners = []
+        
+        # Set when this process serves the reminders to clients, see serve()
+        self.server = None
+        self.owner_lock = None
+        
+        # Reminders of every list opened so far, indexed by id; ids are unique across lists
+        self.reminders = {}
+        self.lists = {}
+        self.id_allocator = ReminderIdAllocator(os.path.join(self.config_dir, "next_id"))
+        self.scheduler = ReminderScheduler()
+        self.reminder_thread = threading.Thread(target=self.check_reminders)
+        self.reminder_thread.daemon = True
+        self.start_checker = start_checker
+        # Notifications being shown, so a crash neither repeats nor loses one, see replay_fire_log()
+        self.fire_log = FireLog(os.path.join(self.config_dir, "fire.log")) if start_checker else None
+        
+        # Next due time of each named list as last seen, so that lists with
+        # nothing due soon can stay unloaded, see note_list_due()
+        self.lists_file = os.path.join(self.config_dir, "lists.json")
+        self.list_due = {
+            entry['name']: entry.get('next_due')
+            for entry in read_json_list(self.lists_file)
+            if isinstance(entry, dict) and 'name' in entry
+        }
+        
+        # Load existing reminders of the list asked for
+        self.open_list(reminder_list)
+        
+        # The checker also fires the named lists, loading each once it has something due
+        if start_checker:
+            for name in ReminderList.names(self.config_dir):
+                if name in self.lists:
+                    continue
+                if name not in self.list_due:
+                    self.open_list(name)  # Not seen before, so its due time is unknown
+                elif self.list_due[name] is not None:
+                    self.scheduler.expect(name, self.list_due[name])
+        
+        # Start the reminder checker thread
+        self.sleep_monitor = None
+        self.clock_monitor = None
+        if start_checker:
+            self.sleep_monitor = self.create_sleep_monitor()
+            self.sleep_monitor.start()
+            self.clock_monitor = self.create_clock_monitor()
+            self.clock_monitor.start()
+            # Without both, a resume or clock change is only noticed when the checker next looks
+            if not (self.sleep_monitor.active and self.clock_monitor.active):
+                self.scheduler.check_interval = ReminderScheduler.CLOCK_CHECK_INTERVAL
+            self.reminder_thread.start()
+            if self.archive_after:
+                self.call_soon(self.run_archiving)
+            if self.metrics is not None:
+                self.start_metrics(metrics_port)
+    
+    def open_list(self, name=ReminderList.DEFAULT):
+        """Return the named reminder list, loading it on first use
+
+        Its pending reminders join the scheduler. Once the checker is
+        running, the ones already due go through catch_up_reminders(), and
+        change listeners hear about every reminder loaded.
+        """
+        reminder_list = self.lists.get(name)
+        if reminder_list is not None:
+            return reminder_list
+        
+        directory = ReminderList.directory_for(self.config_dir, name)
+        os.makedirs(directory, exist_ok=True)
+        reminder_list = ReminderList(
+            name,
+            directory,
+            None,
+            # Completed reminders moved out of the store by archive_completed()
+            ReminderArchive(os.path.join(directory, "archive.jsonl.gz"))
+        )
+        reminder_list.store = STORAGE_BACKENDS[self.storage](
+            os.path.join(directory, "reminders.json"),
+            lambda: reminder_list.reminders.values()
+        )
+        # Only what archive_completed() would leave behind is kept in memory
+        reminder_list.store.recent_completed = self.archive_after or self.RECENT_COMPLETED
+        start = time.perf_counter()
+        loaded = self.load_reminders(reminder_list)
+        if self.metrics is not None:
+            self.metrics.observe('reminder_load_seconds', time.perf_counter() - start)
+        if self.write_delay:
+            reminder_list.store = WriteBehindStore(reminder_list.store, self.call_later, self.write_delay, self.metrics)
+        self.lists[name] = reminder_list
+        if self.fire_log is not None:
+            self.replay_fire_log(reminder_list)
+        
+        self.scheduler.expect(name, None)
+        running = self.reminder_thread.ident is not None
+        now = time.time()
+        due = [r for r in loaded if not r.triggered and r.trigger_time <= now] if running else []
+        self.scheduler.push_many(r for r in loaded if not r.triggered and not (running and r.trigger_time <= now))
+        if self.change_listeners:
+            for reminder in loaded:
+                self.notify_change("added", reminder)
+        if due:
+            self.catch_up_reminders(due)
+        
+        if self.start_checker and reminder_list.store.watched_path() is not None:
+            reminder_list.file_watcher = self.create_file_watcher(
+                reminder_list.store.watched_path(),
+                functools.partial(self.reload_external_changes, name)
+            )
+            reminder_list.file_watcher.start()
+        self.note_list_due(name)
+        return reminder_list
+    
+    def replay_fire_log(self, reminder_list):
+        """Finish firing the reminders of a freshly loaded list that a crash interrupted
+
+        A reminder still due at the time it was logged as fired never had
+        its change stored, so it is changed now, without a notification.
+        Notifications never confirmed as shown are shown now. The reminder
+        may have been completed meanwhile, so it is also looked for among
+        the stored history.
+        """
+        entries = {
+            reminder_id: entry for reminder_id, entry in self.fire_log.entries.items()
+            if entry['list'] == reminder_list.name
+        }
+        unshown = []
+        for reminder_id, entry in entries.items():
+            reminder = reminder_list.reminders.get(reminder_id)
+            if reminder is not None and not reminder.triggered and reminder.trigger_time == entry['time']:
+                self.advance_reminder(reminder)
+            if not entry['shown']:
+                unshown.append(reminder_id)
+        if not unshown:
+            return
+        
+        missing = set(unshown).difference(reminder_list.reminders)
+        completed = {}
+        if missing:
+            for record in reminder_list.store.iter_history(reminder_list.reminders):
+                if record['id'] in missing:
+                    completed[record['id']] = record
+        for reminder_id in unshown:
+            reminder = reminder_list.reminders.get(reminder_id) or completed.get(reminder_id)
+            if reminder is None:
+                self.fire_log.shown([reminder_id])  # Removed since, nothing left to show
+            else:
+                self.trigger_notification(reminder)
+    
+    def notification_delivered(self, reminder_ids):
+        """Log that notifications are out, compacting the fire log now and then"""
+        if self.fire_log is None:
+            return
+        self.fire_log.shown(reminder_ids)
+        if self.fire_log.records >= FireLog.COMPACT_RECORDS:
+            self.compact_fire_log()
+    
+    def compact_fire_log(self):
+        """Write out every store, then drop the fire log entries they made redundant"""
+        try:
+            for reminder_list in self.lists.values():
+                if isinstance(reminder_list.store, WriteBehindStore):
+                    reminder_list.store.flush()
+            self.fire_log.compact(set(self.lists))
+        except OSError as e:
+            print(f"Could not compact {self.fire_log.path}: {e}", file=sys.stderr)
+    
+    def list_names(self):
+        """Names of every reminder list, loaded or not"""
+        return ReminderList.names(self.config_dir)
+    
+    def list_of(self, reminder):
+        """The loaded ReminderList a reminder belongs to"""
+        return self.lists[reminder_list_name(reminder)]
+    
+    def note_list_due(self, name):
+        """Remember a named list's next due time, saving it at once if it moved earlier
+
+        Only an earlier time has to reach the disk straight away: one that
+        is too early merely loads the list sooner than needed. The rest are
+        saved on shutdown.
+        """
+        if name == ReminderList.DEFAULT:
+            return
+        due = self.scheduler.next_due_time(name)
+        known = name in self.list_due
+        previous = self.list_due.get(name)
+        self.list_due[name] = due
+        if not known or (due is not None and (previous is None or due < previous)):
+            self.save_list_due()
+    
+    def save_list_due(self):
+        """Write the next due time of every named list to lists.json"""
+        atomic_write_json(self.lists_file, [
+            {'name': name, 'next_due': due} for name, due in sorted(self.list_due.items())
+        ])
+    
+    def load_reminders(self, reminder_list):
+        """Load a list's reminders from its storage backend as Reminder records
+
+        Every record is validated and converted here, once, so nothing
+        later has to re-parse its fields; malformed records are skipped.
+        The records are also added to the list and to self.reminders.
+        """
+        loaded = []
+        for record in reminder_list.store.load():
+            try:
+                loaded.append(Reminder.from_dict(record))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"Skipping malformed reminder {record!r}: {e}", file=sys.stderr)
+        self.id_allocator.observe(max((r.id for r in loaded), default=0))
+        self.id_allocator.observe(reminder_list.store.max_history_id())
+        
+        # Ids must also stay clear of the list's history and the lists already loaded
+        taken = reminder_list.store.history_ids()
+        taken = taken.union(self.reminders) if taken else self.reminders
+        repaired = dedupe_reminder_ids(loaded, lambda: self.id_allocator.allocate(taken), taken)
+        for reminder in loaded:
+            self.set_reminder_list(reminder, reminder_list.name)
+            reminder_list.reminders[reminder.id] = reminder
+            self.reminders[reminder.id] = reminder
+        
+        # Rewrite everything once so the old duplicates are gone for good
+        if repaired:
+            reminder_list.store.save(reminder_list.reminders.values())
+        return loaded
+    
+    @staticmethod
+    def set_reminder_list(reminder, name):
+        """Mark a reminder as belonging to the named list"""
+        if name == ReminderList.DEFAULT:
+            if reminder.extra:
+                reminder.extra.pop('list', None)
+        else:
+            reminder['list'] = name
+    
+    def reload_external_changes(self, name=ReminderList.DEFAULT):
+        """Merge an edit of a list's reminders file made by another program, by id
+
+        Only reminders that differ from the ones in memory are added,
+        replaced or removed, and only those are rescheduled. Reminders
+        changed here since the file was last written conflict with the
+        edit, which cannot have seen those changes: the "local" policy keeps
+        them as they are here, "external" takes the file's version. A
+        reminder that fired here stays fired unless the edit moved it.
+        Reminders added here that the file never held are kept under both
+        policies; the edit cannot have removed them. Returns how many
+        reminders changed.
+        """
+        start = time.perf_counter()
+        reminder_list = self.lists[name]
+        store = reminder_list.store
+        previous = store.watched_ids()
+        records = store.reload_if_changed()
+        if records is None:
+            return 0
+        local = store.local_changes()
+        
+        external = {}
+        for record in records:
+            try:
+                reminder = Reminder.from_dict(record)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                print(f"Skipping malformed reminder {record!r}: {e}", file=sys.stderr)
+                continue
+            self.set_reminder_list(reminder, name)
+            external[reminder.id] = reminder
+        self.id_allocator.observe(max(external, default=0))
+        self.id_allocator.observe(store.max_history_id())
+        
+        keep_local = self.conflict_policy == "local"
+        changes = []
+        # Written back so the file, and any journal on top of it, agree with memory
+        put = []
+        deleted = []
+        for reminder_id, reminder in external.items():
+            current = reminder_list.reminders.get(reminder_id)
+            if current is None:
+                if reminder_id in self.reminders:
+                    print(f"Skipping reminder {reminder_id} of list {name}, its id is taken", file=sys.stderr)
+                    continue
+                if reminder_id in local and keep_local:
+                    continue  # Removed here
+                changes.append(("added", None, reminder))
+            elif reminder_id in local and keep_local:
+                continue
+            elif current.triggered and not reminder.triggered and current.trigger_time == reminder.trigger_time:
+                put.append(current)
+                continue
+            elif current.to_dict() != reminder.to_dict():
+                changes.append(("updated", current, reminder))
+            else:
+                continue
+            if reminder_id in local:
+                put.append(reminder)
+        
+        for reminder_id, current in reminder_list.reminders.items():
+            # Completed ones were moved to the store's history, if still in the file
+            if reminder_id in external or current.triggered:
+                continue
+            if reminder_id in local and (keep_local or reminder_id not in previous):
+                continue
+            changes.append(("removed", current, None))
+            if reminder_id in local:
+                deleted.append(reminder_id)
+        
+        for kind, current, reminder in changes:
+            if current is not None:
+                self.scheduler.discard(current)
+            if reminder is None:
+                del self.reminders[current.id]
+                del reminder_list.reminders[current.id]
+                self.notify_change(kind, current)
+            else:
+                self.reminders[reminder.id] = reminder
+                reminder_list.reminders[reminder.id] = reminder
+                if not reminder.triggered:
+                    self.scheduler.push(reminder)
+                self.notify_change(kind, reminder)
+        if put:
+            store.put(put)
+        if deleted:
+            store.delete(deleted)
+        self.note_list_due(name)
+        if self.metrics is not None:
+            self.metrics.observe('reminder_load_seconds', time.perf_counter() - start)
+        return len(changes)
+    
+    def save_reminders(self):
+        """Write the reminders of every loaded list to its storage backend"""
+        start = time.perf_counter()
+        for reminder_list in self.lists.values():
+            reminder_list.store.save(reminder_list.reminders.values())
+        if self.metrics is not None:
+            self.metrics.observe('reminder_save_seconds', time.perf_counter() - start)
+    
+    def start_metrics(self, port):
+        """Register the gauges, then serve the metrics on port and/or write them to metrics_path"""
+        metrics = self.metrics
+        metrics.add_gauge('reminders_pending', "Pending reminders", lambda: len(self.scheduler))
+        metrics.add_gauge('reminders_completed', "Completed reminders in memory",
+                          lambda: len(self.reminders) - len(self.scheduler))
+        metrics.add_gauge('reminder_due_queue_length', "Due reminders waiting for the main loop",
+                          self.due_queue.qsize)
+        metrics.add_gauge('reminder_scheduler_wakeups_total', "Passes of the reminder checker thread",
+                          lambda: self.scheduler.wakeups, "counter")
+        for counter, help in (
+            ('queued', "Due reminders handed to the notification dispatcher"),
+            ('sent', "Notifications shown"),
+            ('coalesced', "Reminders shown as part of a summary notification"),
+            ('dropped', "Reminders dropped by the overflow policy"),
+            ('failed', "Notifications the notification daemon failed to show"),
+        ):
+            metrics.add_gauge(f'reminder_notifications_{counter}_total', help,
+                              functools.partial(self.dispatcher.counters.get, counter), "counter")
+        if self.write_delay:
+            metrics.add_gauge('reminder_store_writes_total', "Writes to the stores",
+                              functools.partial(self.write_counter, 'writes'), "counter")
+            metrics.add_gauge('reminder_store_writes_avoided_total', "Changes written along with others",
+                              functools.partial(self.write_counter, 'avoided'), "counter")
+        metrics.add_gauge('reminder_lists_loaded', "Reminder lists loaded", lambda: len(self.lists))
+        # Served until run_metrics() publishes again
+        metrics.publish()
+        
+        if port:
+            try:
+                self.metrics_server = MetricsServer(port, metrics)
+            except OSError as e:
+                print(f"Could not serve metrics on port {port}: {e}", file=sys.stderr)
+            else:
+                server_thread = threading.Thread(target=self.metrics_server.serve_forever)
+                server_thread.daemon = True
+                server_thread.start()
+        self.call_later(self.METRICS_INTERVAL, self.run_metrics, time.monotonic() + self.METRICS_INTERVAL)
+    
+    def run_metrics(self, expected):
+        """Sample how late this timer ran, publish and write the metrics, and again in METRICS_INTERVAL"""
+        now = time.monotonic()
+        self.metrics.observe('reminder_main_loop_lag_seconds', max(0, now - expected))
+        text = self.metrics.publish()
+        if self.metrics_path is not None:
+            tmp_path = self.metrics_path + ".tmp"
+            try:
+                with open(tmp_path, 'w') as f:
+                    f.write(text)
+                os.replace(tmp_path, self.metrics_path)
+            except OSError as e:
+                print(f"Could not write {self.metrics_path}: {e}", file=sys.stderr)
+        self.call_later(self.METRICS_INTERVAL, self.run_metrics, now + self.METRICS_INTERVAL)
+        return False  # Required for GLib.timeout_add
+    
+    def write_counter(self, name):
+        """Sum of a WriteBehindStore counter over the loaded lists"""
+        return sum(
+            reminder_list.store.counters[name]
+            for reminder_list in list(self.lists.values())
+            if isinstance(reminder_list.store, WriteBehindStore)
+        )
+    
+    def add_change_listener(self, callback):
+        """Call callback(kind, reminder) on every change to the reminders
+
+        kind is "added", "updated" or "removed". Callbacks are invoked on
+        the main loop, where every change is made.
+        """
+        self.change_listeners.append(callback)
+    
+    def remove_change_listener(self, callback):
+        """Stop calling a callback registered with add_change_listener"""
+        self.change_listeners.remove(callback)
+    
+    def notify_change(self, kind, reminder):
+        """Tell the change listeners about a reminder change"""
+        for callback in list(self.change_listeners):
+            callback(kind, reminder)
+    
+    def add_reminder(self, title, message, trigger_time, recurrence=None, reminder_list=ReminderList.DEFAULT):
+        """Add a new reminder to the named list and return it
+
+        recurrence is an optional RRULE or cron rule; trigger_time is then
+        the start of the series, and the reminder first comes due at the
+        first occurrence at or after it. Raises ValueError for a rule that
+        never occurs from then on.
+        """
+        trigger_time = float(trigger_time)
+        start = trigger_time
+        if recurrence:
+            trigger_time = first_occurrence(recurrence, start)
+            if trigger_time is None:
+                raise ValueError(f"{recurrence!r} never occurs after {format_trigger_time(start)}")
+        target = self.open_list(reminder_list)
+        reminder = Reminder(self.id_allocator.allocate(self.reminders), title, message, trigger_time)
+        if recurrence:
+            reminder['recurrence'] = recurrence
+            reminder['recurrence_start'] = start
+        self.set_reminder_list(reminder, target.name)
+        self.reminders[reminder['id']] = reminder
+        target.reminders[reminder.id] = reminder
+        self.scheduler.push(reminder)
+        target.store.put([reminder])
+        self.notify_change("added", reminder)
+        self.note_list_due(target.name)
+        return reminder
+    
+    def add_reminders(self, reminders, reminder_list=ReminderList.DEFAULT):
+        """Add reminders from an iterable of records to the named list, returning how many were added
+
+        Records need a title and trigger_time, plus optionally a message and
+        triggered flag. They are committed in batches of IMPORT_BATCH_SIZE,
+        each with a single store write and a single scheduler update. A
+        batch is validated in full first, so an invalid record leaves
+        nothing of its batch behind.
+        """
+        target = self.open_list(reminder_list)
+        count = 0
+        for batch in batched(reminders, self.IMPORT_BATCH_SIZE):
+            records = [normalize_reminder(item) for item in batch]
+            added = []
+            for record in records:
+                record['id'] = self.id_allocator.allocate(self.reminders)
+                reminder = Reminder.from_dict(record)
+                self.set_reminder_list(reminder, target.name)
+                added.append(reminder)
+            
+            for reminder in added:
+                self.reminders[reminder.id] = reminder
+                target.reminders[reminder.id] = reminder
+            target.store.put(added)
+            self.scheduler.push_many(r for r in added if not r.triggered)
+            for reminder in added:
+                self.notify_change("added", reminder)
+            count += len(added)
+        self.note_list_due(target.name)
+        return count
+    
+    def iter_reminders(self, reminder_list=ReminderList.DEFAULT):
+        """Yield every reminder of the named list, including history kept out of memory and the archive"""
+        target = self.open_list(reminder_list)
+        yield from list(target.reminders.values())
+        yield from target.store.iter_history(target.reminders)
+        yield from target.archive
+    
+    def iter_history(self, reminder_list=ReminderList.DEFAULT):
+        """Yield a list's completed reminders oldest first: the archive, then the stored history, then memory"""
+        target = self.open_list(reminder_list)
+        yield from target.archive
+        yield from target.store.iter_history(target.reminders)
+        yield from [r.to_dict() for r in target.reminders.values() if r.triggered]
+    
+    def archive_completed(self):
+        """Move completed reminders older than archive_after to their list's archive, returning how many"""
+        cutoff = time.time() - self.archive_after
+        count = 0
+        for reminder_list in list(self.lists.values()):
+            store = reminder_list.store
+            in_memory = [r for r in reminder_list.reminders.values() if r.triggered and r.trigger_time < cutoff]
+            stored = [r for r in store.completed_older_than(cutoff) if r['id'] not in reminder_list.reminders]
+            if not in_memory and not stored:
+                continue
+            
+            # Archive first: a crash in between leaves duplicates rather than losing any
+            count += reminder_list.archive.append(itertools.chain(in_memory, stored))
+            for reminder in in_memory:
+                del self.reminders[reminder.id]
+                del reminder_list.reminders[reminder.id]
+            if in_memory:
+                store.delete([r.id for r in in_memory])
+            store.delete_completed_older_than(cutoff)
+            for reminder in in_memory:
+                self.notify_change("removed", reminder)
+        return count
+    
+    def run_archiving(self):
+        """Archive now and again every ARCHIVE_INTERVAL seconds"""
+        self.archive_completed()
+        self.call_later(self.ARCHIVE_INTERVAL, self.run_archiving)
+        return False  # Required for GLib.idle_add
+    
+    def remove_reminder(self, reminder_id):
+        """Remove a reminder by ID"""
+        reminder = self.reminders.pop(reminder_id, None)
+        if reminder is None:
+            return
+        
+        reminder_list = self.list_of(reminder)
+        del reminder_list.reminders[reminder_id]
+        self.scheduler.discard(reminder)
+        reminder_list.store.delete([reminder_id])
+        self.notify_change("removed", reminder)
+    
+    def cleanup_completed_reminders(self, reminder_list=ReminderList.DEFAULT):
+        """Remove all completed reminders of the named list"""
+        target = self.open_list(reminder_list)
+        completed = [r for r in target.reminders.values() if r.triggered]
+        for reminder in completed:
+            del self.reminders[reminder.id]
+            del target.reminders[reminder.id]
+        removed_count = target.store.delete_completed([r.id for r in completed])
+        for reminder in completed:
+            self.notify_change("removed", reminder)
+        
+        # Return True if any reminders were removed
+        return removed_count > 0
+    
+    def check_reminders(self):
+        """Background thread passing reminders to the main loop as they come due"""
+        self.scheduler.run(self.post_due_reminder, self.post_caught_up_reminders, self.post_due_list)
+    
+    def post_due_reminder(self, reminder):
+        """Queue a due reminder for the main loop; called on the checker thread"""
+        self.post_due(self.fire_reminder, reminder)
+    
+    def post_caught_up_reminders(self, reminders):
+        """Queue a catch-up batch for the main loop; called on the checker thread"""
+        self.post_due(self.catch_up_reminders, reminders)
+    
+    def post_due_list(self, name):
+        """Have the main loop load a list that has reminders coming due; called on the checker thread"""
+        self.post_due(self.open_list, name)
+    
+    def post_due(self, handler, arg):
+        self.due_queue.put((handler, arg))
+        with self.due_lock:
+            if self.due_drain_scheduled:
+                return
+            self.due_drain_scheduled = True
+        self.call_soon(self.process_due_reminders)
+    
+    def process_due_reminders(self):
+        """Fire every reminder queued by the checker thread"""
+        # Clear first so a reminder queued while draining schedules a new pass
+        with self.due_lock:
+            self.due_drain_scheduled = False
+        while True:
+            try:
+                handler, arg = self.due_queue.get_nowait()
+            except queue.Empty:
+                break
+            handler(arg)
+        return False  # Required for GLib.idle_add
+    
+    def call_soon(self, func, *args):
+        """Run func(*args) on the main loop that owns the reminder state"""
+        GLib.idle_add(func, *args)
+    
+    def call_later(self, delay, func, *args):
+        """Run func(*args) on the main loop after delay seconds"""
+        GLib.timeout_add(max(0, int(delay * 1000)), func, *args)
+    
+    def run_on_main_loop(self, func, *args):
+        """Run func(*args) on the main loop, wait and return its result
+
+        For other threads only; called on the main loop it would deadlock.
+        """
+        done = threading.Event()
+        result = {}
+        
+        def run():
+            try:
+                result['value'] = func(*args)
+            except Exception as e:
+                result['error'] = e
+            done.set()
+            return False  # Required for GLib.idle_add
+        
+        self.call_soon(run)
+        done.wait()
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+    
+    def catch_up_reminders(self, reminders):
+        """Fire the reminders that came due together after a resume, clock jump or startup
+
+        Reminders overdue by more than CATCH_UP_GRACE follow the catch-up
+        policy: "all" fires them, "latest" only fires the latest of them and
+        "missed" fires none. The others are marked as missed instead.
+        """
+        cutoff = time.time() - self.CATCH_UP_GRACE
+        overdue = sorted((r for r in reminders if r.trigger_time < cutoff), key=lambda r: r.trigger_time)
+        on_time = [r for r in reminders if r.trigger_time >= cutoff]
+        
+        if self.catch_up_policy == "all":
+            on_time = overdue + on_time
+            overdue = []
+        elif self.catch_up_policy == "latest" and overdue:
+            on_time.insert(0, overdue.pop())
+        
+        for reminder in overdue:
+            self.fire_reminder(reminder, missed=True)
+        for reminder in on_time:
+            self.fire_reminder(reminder)
+    
+    def fire_reminder(self, reminder, missed=False):
+        """Notify about a due reminder and mark it as triggered
+
+        Recurring reminders instead move on to their next occurrence, which
+        is the only one ever computed. A missed reminder is handled the same
+        way without a notification, and marked as missed if it is done.
+        """
+        # Removed, or already handled, while waiting in the due queue
+        if reminder.triggered or self.reminders.get(reminder.id) is not reminder:
+            return
+        
+        if not missed:
+            # Logged before anything else happens, see replay_fire_log()
+            if self.fire_log is not None:
+                self.fire_log.fire(reminder.id, reminder.trigger_time, reminder_list_name(reminder))
+            self.trigger_notification(reminder)
+            if self.notification_actions:
+                reminder['unacknowledged'] = 1
+                self.schedule_escalation(reminder)
+        self.advance_reminder(reminder, missed)
+    
+    def advance_reminder(self, reminder, missed=False):
+        """Mark a fired reminder as triggered, or move a recurring one on to its next occurrence"""
+        next_time = None
+        if reminder.get('recurrence'):
+            # Occurrences missed while not running are skipped, not replayed
+            next_time = next_occurrence(reminder, max(time.time(), reminder.trigger_time))
+        if next_time is None:
+            reminder.triggered = True
+            if missed:
+                reminder['missed'] = True
+        else:
+            reminder.trigger_time = next_time
+            reminder['occurrence'] = reminder.get('occurrence', 1) + 1
+            self.scheduler.push(reminder)
+        self.list_of(reminder).store.put([reminder])
+        self.notify_change("updated", reminder)
+    
+    def schedule_escalation(self, reminder):
+        """Show an unacknowledged reminder again after the next escalation delay, if any is left"""
+        count = reminder['unacknowledged']
+        if count <= len(self.escalation):
+            self.call_later(self.escalation[count - 1], self.escalate_reminder, reminder.id, count)
+    
+    def escalate_reminder(self, reminder_id, count):
+        """Notify again about a reminder still unacknowledged after count notifications"""
+        reminder = self.reminders.get(reminder_id)
+        # Acknowledged, snoozed or fired again since
+        if reminder is None or reminder.get('unacknowledged') != count:
+            return False
+        self.trigger_notification(reminder)
+        reminder['unacknowledged'] = count + 1
+        self.list_of(reminder).store.put([reminder])
+        self.notify_change("updated", reminder)
+        self.schedule_escalation(reminder)
+        return False  # Required for GLib.timeout_add
+    
+    def acknowledge_reminder(self, reminder_id):
+        """Record that a notified reminder was seen, ending its escalation"""
+        reminder = self.reminders.get(reminder_id)
+        if reminder is None or not reminder.get('unacknowledged'):
+            return False
+        reminder.extra.pop('unacknowledged')
+        self.list_of(reminder).store.put([reminder])
+        self.notify_change("updated", reminder)
+        return True
+    
+    def snooze_reminder(self, reminder_id, minutes):
+        """Have a notified reminder come due again in minutes, acknowledging it
+
+        Only the changed reminder is rescheduled and written. A recurring
+        reminder has already moved on to its next occurrence, so the
+        occurrence is taken back and shown at the snooze time instead,
+        unless the next one comes sooner anyway.
+        """
+        reminder = self.reminders.get(reminder_id)
+        if reminder is None:
+            return False
+        if reminder.extra:
+            reminder.extra.pop('unacknowledged', None)
+        snooze_time = time.time() + minutes * 60
+        if reminder.triggered:
+            reminder.triggered = False
+            reminder.trigger_time = snooze_time
+            if reminder.extra:
+                reminder.extra.pop('missed', None)
+            self.scheduler.push(reminder)
+        elif reminder.get('recurrence') and snooze_time < reminder.trigger_time:
+            reminder.trigger_time = snooze_time
+            reminder['occurrence'] = reminder.get('occurrence', 1) - 1
+            self.scheduler.push(reminder)
+        self.list_of(reminder).store.put([reminder])
+        self.notify_change("updated", reminder)
+        self.note_list_due(reminder_list_name(reminder))
+        return True
+    
+    def on_notification_action(self, notification, action, user_data=None):
+        """Apply a notification button to the reminders the notification shows"""
+        for reminder_id in self.notification_ids.get(notification, ()):
+            if action == "done":
+                self.acknowledge_reminder(reminder_id)
+            elif action.startswith("snooze-"):
+                self.snooze_reminder(reminder_id, int(action[len("snooze-"):]))
+    
+    def on_notification_closed(self, notification):
+        """A notification the user dismissed counts as seen"""
+        if notification.get_closed_reason() == self.DISMISSED_BY_USER:
+            for reminder_id in self.notification_ids.get(notification, ()):
+                self.acknowledge_reminder(reminder_id)
+        self.notification_ids.pop(notification, None)
+        if notification is not self.summary_notification:
+            self.idle_notifications.append(notification)
+    
+    def init_notifications(self):
+        """Connect to the notification daemon"""
+        require_gi()
+        Notify.init("Reminder App")
+        self.notification_actions = "actions" in (Notify.get_server_caps() or [])
+        
+        # Closed notifications are updated and shown again instead of recreated
+        self.idle_notifications = []
+        self.summary_notification = None
+        # Reminders each notification with buttons is showing
+        self.notification_ids = {}
+    
+    def close_notifications(self):
+        """Disconnect from the notification daemon"""
+        Notify.uninit()
+    
+    def trigger_notification(self, reminder):
+        """Hand a due reminder to the notification dispatcher"""
+        self.dispatcher.submit(reminder)
+    
+    def create_sleep_monitor(self):
+        """Return the SleepMonitor telling the scheduler about resumes"""
+        return LogindSleepMonitor(self.scheduler.resumed)
+    
+    def create_clock_monitor(self):
+        """Return the ClockMonitor telling the scheduler about the wall clock being set"""
+        return TimerfdClockMonitor(self.scheduler.clock_changed)
+    
+    def create_file_watcher(self, path, on_change):
+        """Return the FileWatcher reporting edits of a reminders file made elsewhere"""
+        return GioFileWatcher(path, on_change, self.call_later)
+    
+    def show_notification(self, title, message, summary=False, reminder_ids=()):
+        """Display a system notification
+
+        Summaries share one notification that is updated in place, so a new
+        summary replaces the previous one rather than stacking up. If the
+        daemon supports them, the notification gets snooze and done buttons
+        acting on every reminder in reminder_ids.
+        """
+        if summary and self.summary_notification is not None:
+            notification = self.summary_notification
+            notification.update(title, message, "dialog-information")
+        elif not summary and self.idle_notifications:
+            notification = self.idle_notifications.pop()
+            notification.update(title, message, "dialog-information")
+        else:
+            notification = Notify.Notification.new(title, message, "dialog-information")
+            notification.set_urgency(Notify.Urgency.NORMAL)
+            if summary:
+                self.summary_notification = notification
+            notification.connect("closed", self.on_notification_closed)
+        
+        if self.notification_actions:
+            notification.clear_actions()
+            if reminder_ids:
+                for action, label in self.NOTIFICATION_ACTIONS:
+                    notification.add_action(action, label, self.on_notification_action, None)
+                self.notification_ids[notification] = reminder_ids
+            else:
+                self.notification_ids.pop(notification, None)
+        notification.show()
+    
+    def serve(self):
+        """Accept requests from clients on the local socket"""
+        self.server = ReminderServer(daemon_socket_path(self.config_dir), self)
+        server_thread = threading.Thread(target=self.server.serve_forever)
+        server_thread.daemon = True
+        server_thread.start()
+    
+    def shutdown(self):
+        """Clean up when the application is shutting down"""
+        if self.server is not None:
+            self.server.stop()
+        
+        self.scheduler.stop()
+        if self.sleep_monitor is not None:
+            self.sleep_monitor.stop()
+        if self.clock_monitor is not None:
+            self.clock_monitor.stop()
+        for reminder_list in self.lists.values():
+            if reminder_list.file_watcher is not None:
+                reminder_list.file_watcher.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
+        if self.reminder_thread.ident is not None:
+            self.reminder_thread.join(1)  # Wait up to 1 second for the thread to finish
+            self.close_notifications()
+        
+        for reminder_list in self.lists.values():
+            reminder_list.store.close()
+        if self.fire_log is not None:
+            # The stores are written out, so only notifications not yet shown are left
+            try:
+                self.fire_log.compact(set(self.lists))
+            except OSError as e:
+                print(f"Could not compact {self.fire_log.path}: {e}", file=sys.stderr)
+            self.fire_log.close()
+        if self.start_checker:
+            # Due times that moved later were only kept in memory so far
+            for name in self.lists:
+                if name != ReminderList.DEFAULT:
+                    self.list_due[name] = self.scheduler.next_due_time(name)
+            self.save_list_due()
+        self.id_allocator.close()
+        
+        # Let a waiting background service take over
+        if self.owner_lock is not None:
+            self.owner_lock.close()
+            self.owner_lock = None
+
+# Local IPC between the process that owns the reminders and its clients
+class ReminderServiceError(Exception):
+    """The owning process rejected a request"""
+
+def default_config_dir():
+    """Directory holding the reminders and the files shared between processes"""
+    return os.path.join(str(Path.home()), ".config", "reminder-app")
+
+def daemon_socket_path(config_dir):
+    """Path of the Unix socket served by the owning process
+
+    It sits next to owner.lock, so every process that can see the lock
+    finds the socket too, whatever its environment.
+    """
+    return os.path.join(config_dir, "daemon.sock")
+
+def acquire_owner_lock(config_dir, blocking):
+    """Take the lock that makes this process the owner of the reminders
+
+    Returns the open lock file, to be kept for as long as the process owns
+    the reminders, or None if another process holds it and blocking is False.
+    """
+    os.makedirs(config_dir, exist_ok=True)
+    lock_file = open(os.path.join(config_dir, "owner.lock"), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+class ReminderRequestHandler(socketserver.StreamRequestHandler):
+    """Serves one client connection, one JSON request per line"""
+
+    def setup(self):
+        super().setup()
+        with self.server.subscribers_lock:
+            self.server.connections.add(self.connection)
+
+    def finish(self):
+        with self.server.subscribers_lock:
+            self.server.connections.discard(self.connection)
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get('cmd') == 'subscribe':
+                    self.stream_events()
+                    return
+                if request.get('cmd') == 'export':
+                    self.stream_export(request.get('list', ReminderList.DEFAULT))
+                    continue
+                if request.get('cmd') == 'history':
+                    self.stream_history(request.get('list', ReminderList.DEFAULT))
+                    return
+                response = self.server.dispatch(request)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                response = {'ok': False, 'error': str(e)}
+            self.send(response)
 
-# ReminderWindow class (GUI mode only)
-if GUI_AVAILABLE:
+    def send(self, message):
+        self.wfile.write((json.dumps(message, default=json_default) + "\n").encode())
+
+    def stream_events(self):
+        """Send the current reminders, then every change as it happens"""
+        events = queue.Queue()
+        snapshot = self.server.app.run_on_main_loop(self.server.subscribe, events)
+        try:
+            self.send({'ok': True, 'reminders': snapshot})
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                self.wfile.write(event)
+        except OSError:
+            pass  # Client went away
+        finally:
+            self.server.unsubscribe(events)
+
+    def snapshot(self, name):
+        """Open the named list on the main loop and return it with its in-memory reminders"""
+        app = self.server.app
+        
+        def take():
+            reminder_list = app.open_list(name)
+            return reminder_list, [r.to_dict() for r in reminder_list.reminders.values()]
+        
+        return app.run_on_main_loop(take)
+
+    def stream_export(self, name):
+        """Send every reminder of a list including stored history, one per line"""
+        app = self.server.app
+        reminder_list, in_memory = self.snapshot(name)
+        ids = {r['id'] for r in in_memory}
+        # Started on the main loop, which a backend may need to take its copy
+        history = app.run_on_main_loop(reminder_list.store.iter_history, ids)
+        for reminder in itertools.chain(in_memory, history, reminder_list.archive):
+            self.send({'reminder': reminder})
+        self.send({'ok': True})
+
+    def stream_history(self, name):
+        """Send the completed reminders of a list as fast as the client reads them"""
+        app = self.server.app
+        reminder_list, in_memory = self.snapshot(name)
+        ids = {r['id'] for r in in_memory}
+        history = app.run_on_main_loop(reminder_list.store.iter_history, ids)
+        completed = (r for r in in_memory if r['triggered'])
+        try:
+            for reminder in itertools.chain(reminder_list.archive, history, completed):
+                self.send({'reminder': reminder})
+            self.send({'ok': True})
+        except OSError:
+            pass  # Client stopped paging and went away
+
+class ReminderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket API through which clients use the owning process's reminders
+
+    Requests are JSON objects with a cmd of add, add_many, remove, cleanup,
+    list, status, export, history, lists, open_list or subscribe. Changes are applied on the GLib main
+    loop so clients never race the owner's own state. Commands about a
+    reminder list take its name as list, the default list if not given.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, app):
+        self.app = app
+        self.path = path
+        self.subscribers = set()
+        self.connections = set()
+        self.subscribers_lock = threading.Lock()
+        # Written to by stop() to wake serve_forever from its select()
+        self.wakeup = os.pipe()
+        self.stopping = False
+        self.stopped = threading.Event()
+        
+        # Only the lock holder gets here, so an existing socket is stale
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, ReminderRequestHandler)
+        os.chmod(path, 0o600)
+        app.add_change_listener(self.broadcast)
+
+    def dispatch(self, request):
+        """Handle a single request/response command"""
+        app = self.app
+        command = request.get('cmd')
+        name = request.get('list', ReminderList.DEFAULT)
+        if command == 'add':
+            reminder = app.run_on_main_loop(
+                app.add_reminder,
+                request['title'],
+                request.get('message', ""),
+                parse_trigger_time(request['trigger_time']),
+                request.get('recurrence'),
+                name
+            )
+            return {'ok': True, 'reminder': reminder}
+        if command == 'add_many':
+            return {'ok': True, 'count': app.run_on_main_loop(app.add_reminders, request['reminders'], name)}
+        if command == 'remove':
+            app.run_on_main_loop(app.remove_reminder, request['id'])
+            return {'ok': True}
+        if command == 'cleanup':
+            return {'ok': True, 'removed': app.run_on_main_loop(app.cleanup_completed_reminders, name)}
+        if command == 'list':
+            return {'ok': True, 'reminders': app.run_on_main_loop(
+                lambda: [r.to_dict() for r in app.open_list(name).reminders.values()]
+            )}
+        if command == 'lists':
+            return app.run_on_main_loop(lambda: {'ok': True, 'lists': app.list_names(), 'loaded': sorted(app.lists)})
+        if command == 'open_list':
+            app.run_on_main_loop(app.open_list, name)
+            return {'ok': True}
+        if command == 'status':
+            return app.run_on_main_loop(self.status)
+        return {'ok': False, 'error': f"unknown command {command!r}"}
+
+    def status(self):
+        """The status command's response; call on the main loop"""
+        app = self.app
+        return {
+            'ok': True,
+            'pid': os.getpid(),
+            'reminders': len(app.reminders),
+            'pending': len(app.scheduler),
+            'next_due': app.scheduler.next_due_time(),
+            'notifications': dict(app.dispatcher.counters),
+            'writes': {
+                counter: app.write_counter(counter) for counter in ('changes', 'writes', 'avoided')
+            } if app.write_delay else {},
+            'lists': len(app.lists),
+        }
+
+    def serve_forever(self):
+        """Serve until stop(), sleeping in select() instead of polling for it"""
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(self, selectors.EVENT_READ)
+                selector.register(self.wakeup[0], selectors.EVENT_READ)
+                while not self.stopping:
+                    for key, _ in selector.select():
+                        if key.fileobj is self:
+                            self._handle_request_noblock()
+        finally:
+            self.stopped.set()
+
+    def subscribe(self, events):
+        """Register a subscriber queue and return the reminders it starts from"""
+        with self.subscribers_lock:
+            self.subscribers.add(events)
+        return [r.to_dict() for r in self.app.reminders.values()]
+
+    def unsubscribe(self, events):
+        with self.subscribers_lock:
+            self.subscribers.discard(events)
+
+    def broadcast(self, kind, reminder):
+        """Change listener forwarding every change to the subscribers"""
+        with self.subscribers_lock:
+            if not self.subscribers:
+                return
+            event = (json.dumps({'event': kind, 'reminder': reminder}, default=json_default) + "\n").encode()
+            for events in self.subscribers:
+                events.put(event)
+
+    def stop(self):
+        """Stop serving and tell the subscribers"""
+        self.app.remove_change_listener(self.broadcast)
+        self.stopping = True
+        os.write(self.wakeup[1], b"x")
+        self.stopped.wait()
+        with self.subscribers_lock:
+            for events in self.subscribers:
+                events.put(None)
+            for connection in self.connections:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self.server_close()
+        for fd in self.wakeup:
+            os.close(fd)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+class ReminderClient:
+    """Stand-in for ReminderAppBase that forwards to the owning process
+
+    Covers the API used by the window and the command line. With subscribe
+    set, reminders mirrors the owner's in-memory reminders and is kept
+    current, reconnecting if the owner restarts, by pushed change events.
+    """
+
+    # How long to wait for an owner that holds the lock but is still starting
+    CONNECT_TIMEOUT = 5
+
+    def __init__(self, socket_path, subscribe=False):
+        self.socket_path = socket_path
+        self.reminders = {}
+        self.change_listeners = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._commands = self._connect()
+        
+        self._events = None
+        if subscribe:
+            self.reminders = self._subscribe()
+            self._event_thread = threading.Thread(target=self._follow_events)
+            self._event_thread.daemon = True
+            self._event_thread.start()
+
+    def add_change_listener(self, callback):
+        self.change_listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        self.change_listeners.remove(callback)
+
+    def add_reminder(self, title, message, trigger_time, recurrence=None, reminder_list=ReminderList.DEFAULT):
+        return self.request(
+            'add',
+            title=title,
+            message=message,
+            trigger_time=trigger_time,
+            recurrence=recurrence,
+            list=reminder_list
+        )['reminder']
+
+    def add_reminders(self, reminders, reminder_list=ReminderList.DEFAULT):
+        count = 0
+        for batch in batched(reminders, ReminderAppBase.IMPORT_BATCH_SIZE):
+            count += self.request(
+                'add_many',
+                reminders=[normalize_reminder(r) for r in batch],
+                list=reminder_list
+            )['count']
+        return count
+
+    def remove_reminder(self, reminder_id):
+        self.request('remove', id=reminder_id)
+
+    def cleanup_completed_reminders(self, reminder_list=ReminderList.DEFAULT):
+        return self.request('cleanup', list=reminder_list)['removed']
+
+    def open_list(self, name=ReminderList.DEFAULT):
+        """Have the owner load a list; its reminders then arrive as change events"""
+        self.request('open_list', list=name)
+
+    def list_names(self):
+        return self.request('lists')['lists']
+
+    def status(self):
+        return self.request('status')
+
+    def iter_reminders(self, reminder_list=ReminderList.DEFAULT):
+        return self._stream('export', list=reminder_list)
+
+    def iter_history(self, reminder_list=ReminderList.DEFAULT):
+        return self._stream('history', list=reminder_list)
+
+    def _stream(self, command, **params):
+        """Yield the reminders a streaming command sends, on a connection of its own"""
+        sock, stream = self._connect()
+        try:
+            stream.write((json.dumps(dict(params, cmd=command)) + "\n").encode())
+            stream.flush()
+            for line in stream:
+                message = json.loads(line)
+                if 'reminder' not in message:
+                    return
+                yield message['reminder']
+        finally:
+            stream.close()
+            sock.close()
+
+    def request(self, command, **params):
+        """Send one command and return the response, reconnecting once if needed"""
+        data = (json.dumps(dict(params, cmd=command)) + "\n").encode()
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._commands is None:
+                        self._commands = self._connect()
+                    stream = self._commands[1]
+                    stream.write(data)
+                    stream.flush()
+                    line = stream.readline()
+                    if not line:
+                        raise ConnectionError("reminder service closed the connection")
+                    break
+                except OSError:
+                    self._close_connection(self._commands)
+                    self._commands = None
+                    if attempt:
+                        raise
+        
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise ReminderServiceError(response.get('error', "request failed"))
+        return response
+
+    def shutdown(self):
+        self._closed = True
+        self._close_connection(self._commands)
+        self._close_connection(self._events)
+
+    def _connect(self):
+        deadline = time.monotonic() + self.CONNECT_TIMEOUT
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                return sock, sock.makefile('rwb')
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+    @staticmethod
+    def _close_connection(connection):
+        if connection is not None:
+            sock, stream = connection
+            try:
+                stream.close()
+            except OSError:
+                pass
+            sock.close()
+
+    def _subscribe(self):
+        connection = self._connect()
+        connection[1].write(b'{"cmd": "subscribe"}\n')
+        connection[1].flush()
+        line = connection[1].readline()
+        if not line:
+            self._close_connection(connection)
+            raise ConnectionError("reminder service closed the connection")
+        self._events = connection
+        return {r['id']: r for r in json.loads(line)['reminders']}
+
+    def _follow_events(self):
+        while not self._closed:
+            try:
+                for line in self._events[1]:
+                    message = json.loads(line)
+                    self._apply(message['event'], message['reminder'])
+            except (OSError, ValueError):
+                pass
+            self._close_connection(self._events)
+            
+            # The owner went away; resynchronise once one is back
+            while not self._closed:
+                time.sleep(1)
+                try:
+                    reminders = self._subscribe()
+                except OSError:
+                    continue
+                for reminder in list(self.reminders.values()):
+                    if reminder['id'] not in reminders:
+                        self._apply("removed", reminder)
+                for reminder in reminders.values():
+                    self._apply("updated", reminder)
+                break
+
+    def _apply(self, kind, reminder):
+        if kind == "removed":
+            self.reminders.pop(reminder['id'], None)
+        else:
+            self.reminders[reminder['id']] = reminder
+        for callback in list(self.change_listeners):
+            callback(kind, reminder)
+
+def open_reminders(serve, start_checker=True, **options):
+    """Return the reminders for this process
+
+    If another process owns them this is a ReminderClient talking to it;
+    otherwise this process takes ownership, serving the others if asked.
+    options are passed on to ReminderAppBase.
+    """
+    config_dir = default_config_dir()
+    owner_lock = acquire_owner_lock(config_dir, blocking=False)
+    if owner_lock is None:
+        return ReminderClient(daemon_socket_path(config_dir), subscribe=serve)
+    
+    app = ReminderAppBase(start_checker=start_checker, **options)
+    app.owner_lock = owner_lock
+    if serve:
+        app.serve()
+    return app
+
+# Search and filtering behind the window's reminder list
+class ReminderIndex:
+    """Display order and word index over the reminders shown in the window
+
+    The order is kept sorted by trigger time with completed reminders after
+    the pending ones, and every lowercased word of a title or message maps to the ids using
+    it. Each word of a query matches as a prefix, found by bisecting the
+    sorted vocabulary, so typing never scans the reminders themselves.
+    Reminders can be dicts or Reminder records.
+    """
+    
+    WORD = re.compile(r"\w+")
+    STATUSES = ("all", "pending", "completed")
+    COMPLETED_KEY = (float('inf'),)
+    
+    def __init__(self):
+        self.reset(())
+    
+    def reset(self, reminders):
+        """Index exactly these reminders"""
+        self.reminders = {r['id']: r for r in reminders}
+        self.keys = {rid: self.sort_key(r) for rid, r in self.reminders.items()}
+        self.order = sorted(self.keys.values())
+        words = collections.defaultdict(set)
+        for rid, reminder in self.reminders.items():
+            for word in self.words_of(reminder):
+                words[word].add(rid)
+        self.words = dict(words)
+        self._vocabulary = None
+        self._prefixes = {}
+    
+    @staticmethod
+    def sort_key(reminder):
+        """(time, id) for pending reminders, (inf, time, id) for completed ones"""
+        if reminder['triggered']:
+            return (float('inf'), reminder['trigger_time'], reminder['id'])
+        return (reminder['trigger_time'], reminder['id'])
+    
+    def words_of(self, reminder):
+        return set(self.WORD.findall(f"{reminder['title']} {reminder['message']}".lower()))
+    
+    def __len__(self):
+        return len(self.order)
+    
+    def add(self, reminder):
+        """Index a new reminder, or re-index a changed one"""
+        rid = reminder['id']
+        self.remove(rid)
+        key = self.sort_key(reminder)
+        self.reminders[rid] = reminder
+        self.keys[rid] = key
+        bisect.insort(self.order, key)
+        for word in self.words_of(reminder):
+            ids = self.words.get(word)
+            if ids is None:
+                self.words[sys.intern(word)] = {rid}
+                self._vocabulary = None
+            else:
+                ids.add(rid)
+        self._prefixes = {}
+    
+    def remove(self, rid):
+        reminder = self.reminders.pop(rid, None)
+        if reminder is None:
+            return
+        key = self.keys.pop(rid)
+        del self.order[bisect.bisect_left(self.order, key)]
+        for word in self.words_of(reminder):
+            ids = self.words.get(word)
+            if ids is not None:
+                ids.discard(rid)
+                if not ids:
+                    del self.words[word]
+                    self._vocabulary = None
+        self._prefixes = {}
+    
+    def prefix_matches(self, prefix):
+        """Return the ids of reminders using a word starting with prefix"""
+        ids = self._prefixes.get(prefix)
+        if ids is not None:
+            return ids
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.words)
+        vocabulary = self._vocabulary
+        index = bisect.bisect_left(vocabulary, prefix)
+        ids = set()
+        while index < len(vocabulary) and vocabulary[index].startswith(prefix):
+            ids |= self.words[vocabulary[index]]
+            index += 1
+        self._prefixes[prefix] = ids
+        return ids
+    
+    def query(self, text="", status="all", start=None, end=None):
+        """Return the ids matching every word of text, in display order
+
+        status is one of STATUSES; start and end, if given, bound the
+        trigger time.
+        """
+        matches = None
+        for word in sorted(set(self.WORD.findall(text.lower())), key=len, reverse=True):
+            ids = self.prefix_matches(word)
+            matches = ids if matches is None else matches & ids
+            if not matches:
+                return []
+        
+        # Few matches are cheaper to sort than to find in the full order
+        if matches is None:
+            keys = self.order
+        elif len(matches) * 8 < len(self.order):
+            keys = sorted(self.keys[rid] for rid in matches)
+        else:
+            keys = [key for key in self.order if key[-1] in matches]
+        
+        # Both halves are sorted by trigger time, so ranges are bisected
+        split = bisect.bisect_left(keys, self.COMPLETED_KEY)
+        pending = (0, split) if status != "completed" else (0, 0)
+        completed = (split, len(keys)) if status != "pending" else (split, split)
+        if start is not None:
+            pending = (max(pending[0], bisect.bisect_left(keys, (start,), *pending)), pending[1])
+            completed = (max(completed[0], bisect.bisect_left(keys, (float('inf'), start), *completed)), completed[1])
+        if end is not None:
+            pending = (pending[0], min(pending[1], bisect.bisect_left(keys, (end,), *pending)))
+            completed = (completed[0], min(completed[1], bisect.bisect_left(keys, (float('inf'), end), *completed)))
+        
+        last = operator.itemgetter(-1)
+        if pending == (0, len(keys)) or completed == (0, len(keys)):
+            return list(map(last, keys))
+        return list(map(last, itertools.chain(keys[slice(*pending)], keys[slice(*completed)])))
+    
+    def matches(self, rid, text="", status="all", start=None, end=None):
+        """Whether query() with the same arguments would return the reminder with id rid"""
+        key = self.keys.get(rid)
+        if key is None:
+            return False
+        completed = key >= self.COMPLETED_KEY
+        if status == ("pending" if completed else "completed"):
+            return False
+        trigger_time = key[-2]
+        if (start is not None and trigger_time < start) or (end is not None and trigger_time >= end):
+            return False
+        words = self.words_of(self.reminders[rid])
+        return all(
+            any(word.startswith(prefix) for word in words)
+            for prefix in set(self.WORD.findall(text.lower()))
+        )
+
+# Background mode application (no GUI)
+class BackgroundReminderApp(ReminderAppBase):
+    def __init__(self, **options):
+        # Only one process owns the reminders; wait for a GUI holding them
+        config_dir = default_config_dir()
+        owner_lock = acquire_owner_lock(config_dir, blocking=False)
+        if owner_lock is None:
+            print("Waiting for the running Reminder App instance to exit")
+            owner_lock = acquire_owner_lock(config_dir, blocking=True)
+        
+        super().__init__(**options)
+        self.owner_lock = owner_lock
+        self.serve()
+        self.main_loop = GLib.MainLoop()
+        print("Running in background mode (no GUI)")
+    
+    def run(self):
+        """Run the application in background mode until SIGTERM or SIGINT"""
+        # systemd stops the service with SIGTERM; either way pending changes get saved
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signum, self.on_quit_signal)
+        try:
+            self.main_loop.run()
+        finally:
+            self.shutdown()
+    
+    def on_quit_signal(self):
+        print("Shutting down background service")
+        self.main_loop.quit()
+        return True  # Keep handling the signal until the loop has stopped
+
+@functools.lru_cache(maxsize=None)
+def gui_classes():
+    """Import GTK and build the window and application classes on first use"""
+    require_gi(gtk=True)
+    
+    class ReminderListModel(GObject.Object, Gtk.TreeModel):
+        """Flat tree model over the ids a ReminderIndex query returned
+
+        Rows are built by make_row only when the view asks for them, so the
+        cost of a model is its list of ids however many reminders there are.
+        Rows stay in the index's sort key order, so a change finds its row by
+        bisecting and is shown by inserting or deleting just that row.
+        Iters carry the row position plus one, since zero reads as unset.
+        """
+        
+        COLUMN_TYPES = (
+            GObject.TYPE_STRING,   # id
+            GObject.TYPE_STRING,   # title
+            GObject.TYPE_STRING,   # message
+            GObject.TYPE_STRING,   # time
+            GObject.TYPE_BOOLEAN,  # triggered
+        )
+        # Rows built at most before the cache starts over
+        ROW_CACHE_SIZE = 1000
+        
+        def __init__(self, index, ids, make_row):
+            GObject.Object.__init__(self)
+            self.ids = ids
+            self.reminders = index.reminders
+            # Sort key of each row when it was added, in the same order as ids
+            self.keys = [index.keys[rid] for rid in ids]
+            self.shown = dict(zip(ids, self.keys))
+            self.make_row = make_row
+            self.rows = {}
+        
+        def position(self, reminder_id):
+            """Row position of a reminder, or None if it is not shown"""
+            key = self.shown.get(reminder_id)
+            if key is None:
+                return None
+            return bisect.bisect_left(self.keys, key)
+        
+        def insert(self, reminder_id, key):
+            """Add a reminder's row where key sorts and tell the view"""
+            position = bisect.bisect_left(self.keys, key)
+            self.keys.insert(position, key)
+            self.ids.insert(position, reminder_id)
+            self.shown[reminder_id] = key
+            self.rows.pop(reminder_id, None)
+            self.row_inserted(Gtk.TreePath.new_from_indices([position]), self._iter(position))
+        
+        def remove(self, reminder_id):
+            """Drop a reminder's row, if shown, and tell the view"""
+            position = self.position(reminder_id)
+            if position is None:
+                return
+            del self.keys[position]
+            del self.ids[position]
+            del self.shown[reminder_id]
+            self.rows.pop(reminder_id, None)
+            self.row_deleted(Gtk.TreePath.new_from_indices([position]))
+        
+        def row_updated(self, reminder_id):
+            """Rebuild a changed reminder's row and tell the view"""
+            self.rows.pop(reminder_id, None)
+            position = self.position(reminder_id)
+            if position is not None:
+                self.row_changed(Gtk.TreePath.new_from_indices([position]), self._iter(position))
+        
+        def _iter(self, position):
+            iter_ = Gtk.TreeIter()
+            iter_.user_data = position + 1
+            return iter_
+        
+        def _row(self, iter_):
+            reminder_id = self.ids[iter_.user_data - 1]
+            row = self.rows.get(reminder_id)
+            if row is None:
+                if len(self.rows) >= self.ROW_CACHE_SIZE:
+                    self.rows.clear()
+                row = self.rows[reminder_id] = self.make_row(self.reminders[reminder_id])
+            return row
+        
+        def do_get_flags(self):
+            return Gtk.TreeModelFlags.LIST_ONLY
+        
+        def do_get_n_columns(self):
+            return len(self.COLUMN_TYPES)
+        
+        def do_get_column_type(self, column):
+            return self.COLUMN_TYPES[column]
+        
+        def do_get_iter(self, path):
+            indices = path.get_indices()
+            if len(indices) == 1 and 0 <= indices[0] < len(self.ids):
+                return (True, self._iter(indices[0]))
+            return (False, None)
+        
+        def do_get_path(self, iter_):
+            return Gtk.TreePath.new_from_indices([iter_.user_data - 1])
+        
+        def do_get_value(self, iter_, column):
+            return self._row(iter_)[column]
+        
+        def do_iter_next(self, iter_):
+            if iter_.user_data < len(self.ids):
+                iter_.user_data += 1
+                return True
+            return False
+        
+        def do_iter_previous(self, iter_):
+            if iter_.user_data > 1:
+                iter_.user_data -= 1
+                return True
+            return False
+        
+        def do_iter_children(self, parent):
+            if parent is None and self.ids:
+                return (True, self._iter(0))
+            return (False, None)
+        
+        def do_iter_has_child(self, iter_):
+            return False
+        
+        def do_iter_n_children(self, iter_):
+            return len(self.ids) if iter_ is None else 0
+        
+        def do_iter_nth_child(self, parent, n):
+            if parent is None and 0 <= n < len(self.ids):
+                return (True, self._iter(n))
+            return (False, None)
+        
+        def do_iter_parent(self, child):
+            return (False, None)
+    
     class ReminderWindow(Gtk.ApplicationWindow):
+        # Repeat choices offered next to the custom rule entry
+        REPEAT_PRESETS = {
+            "Does not repeat": None,
+            "Daily": "FREQ=DAILY",
+            "Weekdays": "FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR",
+            "Weekly": "FREQ=WEEKLY",
+            "Monthly": "FREQ=MONTHLY",
+            "Yearly": "FREQ=YEARLY",
+        }
+        
+        # Upcoming occurrences listed in a recurring reminder's tooltip
+        UPCOMING_COUNT = 5
+        
+        # History rows loaded per page as the list is scrolled
+        HISTORY_PAGE_SIZE = 200
+        
         def __init__(self, *args, **kwargs):
             super().__init__(*args, **kwargs)
             
             self.app = kwargs['application']
+            # Either the reminders themselves or a client of the process owning them
+            self.backend = self.app.backend
             
             self.set_title("Reminder App")
             self.set_default_size(500, 400)
@@ -169,6 +4363,24 @@ if GUI_AVAILABLE:
             
             creation_box.pack_start(self.time_stack, False, True, 0)
             
+            # Recurrence selection
+            repeat_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+            repeat_label = Gtk.Label(label="Repeat:")
+            repeat_label.set_width_chars(10)
+            
+            self.repeat_combo = Gtk.ComboBoxText()
+            for name in self.REPEAT_PRESETS:
+                self.repeat_combo.append_text(name)
+            self.repeat_combo.set_active(0)
+            
+            self.repeat_entry = Gtk.Entry()
+            self.repeat_entry.set_placeholder_text("or an RRULE / cron rule")
+            
+            repeat_box.pack_start(repeat_label, False, True, 0)
+            repeat_box.pack_start(self.repeat_combo, False, True, 0)
+            repeat_box.pack_start(self.repeat_entry, True, True, 0)
+            creation_box.pack_start(repeat_box, False, True, 0)
+            
             # Add reminder button
             add_button = Gtk.Button(label="Add Reminder")
             add_button.connect("clicked", self.on_add_clicked)
@@ -182,9 +4394,54 @@ if GUI_AVAILABLE:
             list_box.set_border_width(10)
             list_frame.add(list_box)
             
-            # Create the list store and view
-            self.reminder_store = Gtk.ListStore(str, str, str, str, bool)  # id as string, title, message, time, triggered
-            self.reminder_view = Gtk.TreeView(model=self.reminder_store)
+            # The reminder list shown and added to; typing a new name creates a list
+            self.current_list = self.app.options.get('reminder_list', ReminderList.DEFAULT)
+            switch_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+            switch_label = Gtk.Label(label="List:")
+            switch_label.set_width_chars(10)
+            self.list_combo = Gtk.ComboBoxText.new_with_entry()
+            self.list_combo.get_child().set_placeholder_text("Type a name to create a list")
+            self.fill_list_combo()
+            self.list_combo.connect("changed", self.on_list_changed)
+            self.list_combo.get_child().connect("activate", self.on_list_entered)
+            switch_box.pack_start(switch_label, False, True, 0)
+            switch_box.pack_start(self.list_combo, True, True, 0)
+            list_box.pack_start(switch_box, False, True, 0)
+            
+            # Search and filters over the list
+            filter_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+            list_box.pack_start(filter_box, False, True, 0)
+            
+            self.search_entry = Gtk.SearchEntry()
+            self.search_entry.set_placeholder_text("Search titles and messages")
+            self.search_entry.connect("search-changed", self.on_filter_changed)
+            filter_box.pack_start(self.search_entry, True, True, 0)
+            
+            self.status_combo = Gtk.ComboBoxText()
+            for status in ReminderIndex.STATUSES:
+                self.status_combo.append(status, status.capitalize())
+            self.status_combo.set_active_id("all")
+            self.status_combo.connect("changed", self.on_filter_changed)
+            filter_box.pack_start(self.status_combo, False, True, 0)
+            
+            # Date range, as YYYY-MM-DD[THH:MM]; either end may be left open
+            self.from_entry = Gtk.Entry()
+            self.from_entry.set_placeholder_text("From")
+            self.from_entry.set_width_chars(10)
+            self.from_entry.connect("changed", self.on_filter_changed)
+            filter_box.pack_start(self.from_entry, False, True, 0)
+            
+            self.to_entry = Gtk.Entry()
+            self.to_entry.set_placeholder_text("To")
+            self.to_entry.set_width_chars(10)
+            self.to_entry.connect("changed", self.on_filter_changed)
+            filter_box.pack_start(self.to_entry, False, True, 0)
+            
+            # The view shows a lazy model over the reminders the filters match
+            # Columns: id as string, title, message, time, triggered
+            self.index = ReminderIndex()
+            self.reminder_model = None
+            self.reminder_view = Gtk.TreeView()
             
             # Add columns
             renderer_text = Gtk.CellRendererText()
@@ -205,31 +4462,57 @@ if GUI_AVAILABLE:
             column_triggered = Gtk.TreeViewColumn("Completed", renderer_toggle, active=4)
             self.reminder_view.append_column(column_triggered)
             
+            # Fixed row height and column widths, so GTK never measures every
+            # row of the lazy model, which would compute them all
+            for column in self.reminder_view.get_columns():
+                column.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+            sample = self.reminder_view.create_pango_layout(format_trigger_time(time.time()))
+            column_time.set_fixed_width(sample.get_pixel_size()[0] + 16)
+            self.reminder_view.set_fixed_height_mode(True)
+            
+            # Upcoming occurrences are only computed for the row pointed at
+            self.reminder_view.set_has_tooltip(True)
+            self.reminder_view.connect("query-tooltip", self.on_query_tooltip)
+            
             # Scrolled window for the list
             scrolled_window = Gtk.ScrolledWindow()
             scrolled_window.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
             scrolled_window.add(self.reminder_view)
             list_box.pack_start(scrolled_window, True, True, 0)
             
+            # Load more history whenever the list is scrolled near its end
+            self.list_adjustment = scrolled_window.get_vadjustment()
+            self.list_adjustment.connect("value-changed", self.on_list_scrolled)
+            
             # Button box for actions
             button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
             list_box.pack_start(button_box, False, True, 0)
             
             # Delete button
-            delete_button = Gtk.Button(label="Delete Selected")
-            delete_button.connect("clicked", self.on_delete_clicked)
-            button_box.pack_start(delete_button, True, True, 0)
+            self.delete_button = Gtk.Button(label="Delete Selected")
+            self.delete_button.connect("clicked", self.on_delete_clicked)
+            button_box.pack_start(self.delete_button, True, True, 0)
             
             # Clean up completed button
-            cleanup_button = Gtk.Button(label="Clean Up Completed")
-            cleanup_button.connect("clicked", self.on_cleanup_clicked)
-            button_box.pack_start(cleanup_button, True, True, 0)
+            self.cleanup_button = Gtk.Button(label="Clean Up Completed")
+            self.cleanup_button.connect("clicked", self.on_cleanup_clicked)
+            button_box.pack_start(self.cleanup_button, True, True, 0)
             
-            # Refresh reminders list
-            self.refresh_reminders_list()
+            # Completed and archived reminders, paged in while shown
+            self.history_button = Gtk.ToggleButton(label="Show History")
+            self.history_button.connect("toggled", self.on_history_toggled)
+            button_box.pack_start(self.history_button, True, True, 0)
+            self.history_store = None
+            self.history_reminders = None
+            
+            # Changes waiting to be applied
+            self.pending_changes = collections.deque()
+            self.apply_source = None
             
-            # Set up a timer to refresh the list periodically
-            GLib.timeout_add_seconds(5, self.refresh_reminders_list)
+            # Fill the list once, then follow change notifications
+            self.refresh_reminders_list()
+            self.backend.add_change_listener(self.on_reminder_changed)
+            self.connect("destroy", self.on_destroy)
             
             # Show all widgets
             self.show_all()
@@ -282,15 +4565,29 @@ if GUI_AVAILABLE:
                 
                 display_time = trigger_time.strftime("%Y-%m-%d %H:%M")
             
+            # A custom rule takes precedence over the preset
+            recurrence = self.repeat_entry.get_text().strip() or \
+                self.REPEAT_PRESETS[self.repeat_combo.get_active_text()]
+            if recurrence:
+                try:
+                    if first_occurrence(recurrence, trigger_time.timestamp()) is None:
+                        raise ValueError("it never occurs from the chosen time on")
+                except ValueError as e:
+                    self.show_error_dialog(f"Invalid repeat rule: {e}")
+                    return
+            
             # Add the reminder
-            self.app.add_reminder(title, message, trigger_time.timestamp())
+            try:
+                self.backend.add_reminder(title, message, trigger_time.timestamp(), recurrence, self.current_list)
+            except OSError as e:
+                self.show_error_dialog(f"Could not reach the reminder service: {e}")
+                return
             
             # Clear inputs
             self.title_entry.set_text("")
             self.message_entry.set_text("")
-            
-            # Refresh the list
-            self.refresh_reminders_list()
+            self.repeat_entry.set_text("")
+            self.repeat_combo.set_active(0)
         
         def on_delete_clicked(self, button):
             selection = self.reminder_view.get_selection()
@@ -298,12 +4595,20 @@ if GUI_AVAILABLE:
             
             if iter_ is not None:
                 reminder_id = int(model[iter_][0])
-                self.app.remove_reminder(reminder_id)
-                self.refresh_reminders_list()
+                try:
+                    self.backend.remove_reminder(reminder_id)
+                except OSError as e:
+                    self.show_error_dialog(f"Could not reach the reminder service: {e}")
         
         def on_cleanup_clicked(self, button):
             """Remove all completed reminders"""
-            if self.app.cleanup_completed_reminders():
+            try:
+                removed = self.backend.cleanup_completed_reminders(self.current_list)
+            except OSError as e:
+                self.show_error_dialog(f"Could not reach the reminder service: {e}")
+                return
+            
+            if removed:
                 # Show a confirmation dialog
                 dialog = Gtk.MessageDialog(
                     transient_for=self,
@@ -315,40 +4620,216 @@ if GUI_AVAILABLE:
                 dialog.format_secondary_text("All completed reminders have been removed.")
                 dialog.run()
                 dialog.destroy()
+        
+        def fill_list_combo(self):
+            """Offer every reminder list, selecting the current one"""
+            try:
+                names = self.backend.list_names()
+            except OSError:
+                names = [ReminderList.DEFAULT]
+            if self.current_list not in names:
+                names.append(self.current_list)
+            self.list_combo.remove_all()
+            for name in names:
+                self.list_combo.append(name, name)
+            self.list_combo.set_active_id(self.current_list)
+        
+        def on_list_changed(self, combo):
+            # Also emitted while a new name is typed, which waits for activate
+            name = combo.get_active_id()
+            if name is not None:
+                self.switch_list(name)
+        
+        def on_list_entered(self, entry):
+            name = entry.get_text().strip()
+            if name:
+                self.switch_list(name)
+        
+        def switch_list(self, name):
+            """Show the named list, creating it if it does not exist yet"""
+            if name == self.current_list:
+                return
+            try:
+                ReminderList.directory_for(default_config_dir(), name)
+                self.backend.open_list(name)
+            except ValueError as e:
+                self.show_error_dialog(f"Cannot use that name: {e}")
+                return
+            except OSError as e:
+                self.show_error_dialog(f"Could not reach the reminder service: {e}")
+                return
             
-            # Refresh the list
+            self.current_list = name
+            self.history_button.set_active(False)
+            self.fill_list_combo()
             self.refresh_reminders_list()
         
-        def refresh_reminders_list(self):
-            """Refresh the reminders list"""
-            # Clear the list
-            self.reminder_store.clear()
-            
-            # Sort reminders by trigger time (closest first)
-            sorted_reminders = sorted(
-                self.app.reminders,
-                key=lambda r: float('inf') if r['triggered'] else float(r['trigger_time'])
-            )
+        def on_history_toggled(self, button):
+            """Switch the list between the scheduled reminders and the history"""
+            showing = button.get_active()
+            self.delete_button.set_sensitive(not showing)
+            self.cleanup_button.set_sensitive(not showing)
+            self.search_entry.set_sensitive(not showing)
+            self.status_combo.set_sensitive(not showing)
+            self.from_entry.set_sensitive(not showing)
+            self.to_entry.set_sensitive(not showing)
+            if showing:
+                self.history_store = Gtk.ListStore(str, str, str, str, bool)
+                try:
+                    self.history_reminders = self.backend.iter_history(self.current_list)
+                    self.load_history_page()
+                except OSError as e:
+                    self.show_error_dialog(f"Could not reach the reminder service: {e}")
+                self.reminder_view.set_model(self.history_store)
+            else:
+                self.close_history()
+                self.reminder_view.set_model(self.reminder_model)
+        
+        def load_history_page(self):
+            """Append the next page of history rows, if any are left"""
+            if self.history_reminders is None:
+                return
+            page = list(itertools.islice(self.history_reminders, self.HISTORY_PAGE_SIZE))
+            for reminder in page:
+                self.history_store.append(self.make_row(reminder))
+            if len(page) < self.HISTORY_PAGE_SIZE:
+                self.close_history(keep_rows=True)
+        
+        def close_history(self, keep_rows=False):
+            """Stop reading history, also closing a client's history connection"""
+            if self.history_reminders is not None:
+                self.history_reminders.close()
+                self.history_reminders = None
+            if not keep_rows:
+                self.history_store = None
+        
+        def on_list_scrolled(self, adjustment):
+            if self.history_reminders is None:
+                return
+            remaining = adjustment.get_upper() - adjustment.get_value() - adjustment.get_page_size()
+            if remaining < adjustment.get_page_size():
+                try:
+                    self.load_history_page()
+                except OSError as e:
+                    self.close_history(keep_rows=True)
+                    self.show_error_dialog(f"Could not reach the reminder service: {e}")
+        
+        def on_destroy(self, widget):
+            self.backend.remove_change_listener(self.on_reminder_changed)
+            self.close_history()
+        
+        def on_reminder_changed(self, kind, reminder):
+            """Queue a reminder change; may be called from the checker thread"""
+            self.pending_changes.append((kind, reminder))
+            if self.apply_source is None:
+                self.apply_source = GLib.idle_add(self.apply_pending_changes)
+        
+        def apply_pending_changes(self):
+            """Apply queued changes to the index, then to the rows they touch only"""
+            # Clear first so a change queued while draining schedules a new pass
+            self.apply_source = None
+            filters = self.filter_values()
+            while self.pending_changes:
+                kind, reminder = self.pending_changes.popleft()
+                if kind == "removed" or reminder_list_name(reminder) != self.current_list:
+                    self.index.remove(reminder['id'])
+                    self.reminder_model.remove(reminder['id'])
+                else:
+                    self.index.add(reminder)
+                    self.update_row(reminder['id'], filters)
+            return False  # Required for GLib.idle_add
+        
+        def update_row(self, reminder_id, filters):
+            """Add, refresh, move or drop the row of a reminder the index just took in"""
+            model = self.reminder_model
+            key = self.index.keys[reminder_id]
+            if not self.index.matches(reminder_id, *filters):
+                model.remove(reminder_id)
+            elif model.shown.get(reminder_id) == key:
+                model.row_updated(reminder_id)
+            else:
+                model.remove(reminder_id)
+                model.insert(reminder_id, key)
+        
+        def filter_values(self):
+            """Return the query, status and date range the filters ask for"""
+            bounds = []
+            for entry in (self.from_entry, self.to_entry):
+                text = entry.get_text().strip()
+                bound = None
+                if text:
+                    try:
+                        bound = parse_trigger_time(text)
+                    except ValueError:
+                        pass
+                # Mark what cannot be parsed rather than interrupt the typing
+                style = entry.get_style_context()
+                if text and bound is None:
+                    style.add_class("error")
+                else:
+                    style.remove_class("error")
+                bounds.append(bound)
+            return self.search_entry.get_text(), self.status_combo.get_active_id(), bounds[0], bounds[1]
+        
+        def apply_filter(self):
+            """Show the reminders matching the filters, keeping the scroll position"""
+            ids = self.index.query(*self.filter_values())
+            if self.reminder_model is not None and ids == self.reminder_model.ids:
+                return
             
-            # Add reminders to the list
-            for reminder in sorted_reminders:
-                # Format the time for display
-                if reminder['triggered']:
-                    time_str = "Completed"
+            self.reminder_model = ReminderListModel(self.index, ids, self.make_row)
+            if self.history_reminders is None and self.history_store is None:
+                scrolled_to = self.list_adjustment.get_value()
+                self.reminder_view.set_model(self.reminder_model)
+                self.list_adjustment.set_value(scrolled_to)
+        
+        def on_filter_changed(self, widget):
+            self.apply_filter()
+        
+        def on_query_tooltip(self, view, x, y, keyboard_mode, tooltip):
+            """List the next occurrences of the recurring reminder under the pointer"""
+            found, x, y, model, path, iter_ = view.get_tooltip_context(x, y, keyboard_mode)
+            if not found:
+                return False
+            reminder = self.index.reminders.get(int(model[iter_][0]))
+            if reminder is None or reminder['triggered'] or not reminder.get('recurrence'):
+                return False
+            upcoming = upcoming_occurrences(reminder, self.UPCOMING_COUNT)
+            tooltip.set_text("Next: " + ", ".join(format_trigger_time(t) for t in upcoming))
+            view.set_tooltip_row(tooltip, path)
+            return True
+        
+        def make_row(self, reminder):
+            """Build the list row for a reminder"""
+            if reminder['triggered']:
+                if reminder.get('missed'):
+                    time_str = "Missed"
+                elif reminder.get('unacknowledged'):
+                    time_str = "Not seen"
                 else:
-                    trigger_time = datetime.datetime.fromtimestamp(float(reminder['trigger_time']))
-                    time_str = trigger_time.strftime("%Y-%m-%d %H:%M")
-                
-                # Convert the ID to string to avoid integer overflow
-                self.reminder_store.append([
-                    str(reminder['id']),  # Store ID as string
-                    reminder['title'],
-                    reminder['message'],
-                    time_str,
-                    reminder['triggered']
-                ])
+                    time_str = "Completed"
+            else:
+                time_str = format_trigger_time(reminder['trigger_time'])
+                if reminder.get('recurrence'):
+                    time_str += " \u21bb"
             
-            return True  # Return True to keep the timer running
+            # Convert the ID to string to avoid integer overflow
+            return [
+                str(reminder['id']),
+                reminder['title'],
+                reminder['message'],
+                time_str,
+                reminder['triggered'],
+            ]
+        
+        def refresh_reminders_list(self):
+            """Rebuild the index and the list from every reminder of the current list"""
+            self.pending_changes.clear()
+            self.index.reset([
+                r for r in list(self.backend.reminders.values()) if reminder_list_name(r) == self.current_list
+            ])
+            self.reminder_model = None
+            self.apply_filter()
         
         def show_error_dialog(self, message):
             """Show an error dialog with the given message"""
@@ -362,123 +4843,18 @@ if GUI_AVAILABLE:
             dialog.format_secondary_text(message)
             dialog.run()
             dialog.destroy()
-
-# Base application class that handles reminders in both GUI and background modes
-class ReminderAppBase:
-    def __init__(self):
-        # Initialize notification system
-        Notify.init("Reminder App")
-        
-        # Path for storing reminders
-        self.config_dir = os.path.join(str(Path.home()), ".config", "reminder-app")
-        self.reminders_file = os.path.join(self.config_dir, "reminders.json")
-        
-        # Create config directory if it doesn't exist
-        os.makedirs(self.config_dir, exist_ok=True)
-        
-        # Load existing reminders
-        self.reminders = self.load_reminders()
-        
-        # Start the reminder checker thread
-        self.stop_thread = False
-        self.reminder_thread = threading.Thread(target=self.check_reminders)
-        self.reminder_thread.daemon = True
-        self.reminder_thread.start()
     
-    def load_reminders(self):
-        """Load reminders from the JSON file"""
-        if os.path.exists(self.reminders_file):
-            try:
-                with open(self.reminders_file, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return []
-        return []
-    
-    def save_reminders(self):
-        """Save reminders to the JSON file"""
-        with open(self.reminders_file, 'w') as f:
-            json.dump(self.reminders, f)
-    
-    def add_reminder(self, title, message, trigger_time):
-        """Add a new reminder"""
-        # Use a smaller integer for ID that fits within 32-bit range
-        reminder = {
-            'id': int(time.time()) % 2000000000,  # Ensure ID is within 32-bit integer range
-            'title': title,
-            'message': message,
-            'trigger_time': trigger_time,
-            'triggered': False
-        }
-        self.reminders.append(reminder)
-        self.save_reminders()
-    
-    def remove_reminder(self, reminder_id):
-        """Remove a reminder by ID"""
-        self.reminders = [r for r in self.reminders if r['id'] != reminder_id]
-        self.save_reminders()
-    
-    def cleanup_completed_reminders(self):
-        """Remove all completed reminders"""
-        initial_count = len(self.reminders)
-        self.reminders = [r for r in self.reminders if not r['triggered']]
-        self.save_reminders()
-        
-        # Return True if any reminders were removed
-        return len(self.reminders) < initial_count
-    
-    def check_reminders(self):
-        """Background thread to check for due reminders"""
-        while not self.stop_thread:
-            current_time = datetime.datetime.now().timestamp()
-            
-            for reminder in self.reminders:
-                if not reminder['triggered'] and float(reminder['trigger_time']) <= current_time:
-                    if GUI_AVAILABLE:
-                        GLib.idle_add(self.trigger_notification, reminder)
-                    else:
-                        # Direct notification without idle_add
-                        self.trigger_notification(reminder)
-                    reminder['triggered'] = True
-                    if GUI_AVAILABLE:
-                        GLib.idle_add(self.save_reminders)
-                    else:
-                        self.save_reminders()
-            
-            # Check every second
-            time.sleep(1)
-    
-    def trigger_notification(self, reminder):
-        """Display a system notification for the reminder"""
-        notification = Notify.Notification.new(
-            reminder['title'],
-            reminder['message'],
-            "dialog-information"
-        )
-        notification.set_urgency(Notify.Urgency.NORMAL)
-        notification.show()
-        
-        if GUI_AVAILABLE:
-            return False  # Required for GLib.idle_add
-    
-    def shutdown(self):
-        """Clean up when the application is shutting down"""
-        self.stop_thread = True
-        if self.reminder_thread.is_alive():
-            self.reminder_thread.join(1)  # Wait up to 1 second for the thread to finish
-        
-        Notify.uninit()
-
-# GUI application (when not in background mode)
-if GUI_AVAILABLE:
-    class ReminderApp(Gtk.Application, ReminderAppBase):
-        def __init__(self):
+    class ReminderApp(Gtk.Application):
+        def __init__(self, **options):
             Gtk.Application.__init__(
                 self,
                 application_id="com.example.reminder",
                 flags=Gio.ApplicationFlags.HANDLES_COMMAND_LINE
             )
-            ReminderAppBase.__init__(self)
+            
+            # Set up in do_startup, which only runs in the primary instance
+            self.options = options
+            self.backend = None
             
             # Add command line option handler
             self.add_main_option(
@@ -500,6 +4876,18 @@ if GUI_AVAILABLE:
                 None
             )
         
+        def do_startup(self):
+            Gtk.Application.do_startup(self)
+            # Use the background service if it is running, otherwise own the reminders
+            self.backend = open_reminders(serve=True, **self.options)
+            # Quit like closing the window does, so do_shutdown saves pending changes
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signum, self.on_quit_signal)
+        
+        def on_quit_signal(self):
+            self.quit()
+            return True  # Keep handling the signal until the loop has stopped
+        
         def do_command_line(self, command_line):
             options = command_line.get_options_dict()
             
@@ -523,34 +4911,238 @@ if GUI_AVAILABLE:
         
         def do_shutdown(self):
             """Clean up when the application is shutting down"""
-            self.shutdown()
+            if self.backend is not None:
+                self.backend.shutdown()
             Gtk.Application.do_shutdown(self)
+    
+    return ReminderWindow, ReminderApp
 
-# Background mode application (no GUI)
-else:
-    class BackgroundReminderApp(ReminderAppBase):
-        def __init__(self):
-            super().__init__()
-            self.main_loop = GLib.MainLoop()
-            print("Running in background mode (no GUI)")
-        
-        def run(self):
-            """Run the application in background mode"""
-            try:
-                self.main_loop.run()
-            except KeyboardInterrupt:
-                print("Shutting down background service")
-            finally:
-                self.shutdown()
-
-def main():
-    if GUI_AVAILABLE:
-        app = ReminderApp()
-        return app.run(sys.argv)
+def build_parser():
+    """Command line options, none of which need GTK to be parsed"""
+    parser = argparse.ArgumentParser(description="Reminder Application")
+    parser.add_argument("--background", "-b", action="store_true", help="Run in background mode")
+    parser.add_argument("--show-ui", "-u", action="store_true", help="Show UI (ignores background mode)")
+    parser.add_argument("--storage", choices=["journal", "json", "sqlite"], default="journal",
+                        help="Storage backend for reminders (default: journal)")
+    parser.add_argument("--import", dest="import_file", metavar="FILE",
+                        help="Import reminders from FILE ('-' for stdin) and exit")
+    parser.add_argument("--export", dest="export_file", metavar="FILE",
+                        help="Export all reminders to FILE ('-' for stdout) and exit")
+    parser.add_argument("--format", choices=["jsonl", "csv", "ics"],
+                        help="Format for --import/--export (default: from the file extension)")
+    parser.add_argument("--list", action="store_true", help="List pending reminders and exit")
+    parser.add_argument("--reminder-list", metavar="NAME", default=ReminderList.DEFAULT,
+                        help="Reminder list for --add, --list, --import and --export, and the one the "
+                             "window opens with (default: default)")
+    parser.add_argument("--add", metavar="TITLE", help="Add a reminder and exit")
+    parser.add_argument("--message", default="", help="Message for --add")
+    parser.add_argument("--at", help="When the --add reminder is due: ISO 8601 date/time or timestamp")
+    parser.add_argument("--in", dest="delay", help="When the --add reminder is due from now, e.g. 30m, 2h, 1d")
+    parser.add_argument("--repeat", metavar="RULE", help="RRULE or cron rule for --add")
+    parser.add_argument("--status", action="store_true", help="Show the background service status and exit")
+    parser.add_argument("--catch-up", choices=ReminderAppBase.CATCH_UP_POLICIES, default="all",
+                        help="Reminders that came due while asleep or not running: fire all, "
+                             "fire the latest only, or mark them as missed (default: all)")
+    parser.add_argument("--archive-after", type=float, default=30, metavar="DAYS",
+                        help="Move reminders completed more than DAYS ago to the compressed archive, "
+                             "0 to never archive (default: 30)")
+    parser.add_argument("--write-delay", type=float, default=1.0, metavar="SECONDS",
+                        help="Save changes at most once per SECONDS, 0 to save every change "
+                             "straight away (default: 1)")
+    parser.add_argument("--on-conflict", choices=ReminderAppBase.CONFLICT_POLICIES, default="local",
+                        help="When reminders.json is edited elsewhere, keep reminders also changed here "
+                             "(local) or take the file's version (external) (default: local)")
+    parser.add_argument("--escalate", type=parse_escalation, default="5,15,60", metavar="DELAYS",
+                        help="Show a reminder nobody acknowledged again after each of these delays, "
+                             "e.g. 5,15,60 (minutes) or 30s,2h; 0 to notify only once (default: 5,15,60)")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-file", action="store_true",
+                        help="Write Prometheus metrics to metrics.prom in the config directory every 15 seconds")
+    parser.add_argument("--notify-window", type=float, default=2.0, metavar="SECONDS",
+                        help="Combine reminders due within SECONDS into one notification (default: 2)")
+    parser.add_argument("--notify-rate", type=int, default=10, metavar="N",
+                        help="Show at most N notifications per minute, 0 for no limit (default: 10)")
+    parser.add_argument("--notify-queue", type=int, default=50, metavar="N",
+                        help="Reminders waiting for a notification before the overflow policy applies (default: 50)")
+    parser.add_argument("--notify-overflow", choices=NotificationDispatcher.OVERFLOW_POLICIES, default="summary",
+                        help="Count reminders beyond --notify-queue into the summary, or drop them (default: summary)")
+    return parser
+
+DELAY_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+def parse_delay(text):
+    """Turn a delay such as 90s, 30m, 2h or 1d into seconds"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*", text.lower())
+    if not match:
+        raise ValueError(f"bad delay {text!r}, expected e.g. 30m, 2h or 1d")
+    return float(match.group(1)) * DELAY_UNITS[match.group(2) or 'm']
+
+def parse_escalation(text):
+    """Turn a comma separated list of delays into seconds, with 0 meaning none"""
+    delays = tuple(parse_delay(part) for part in text.split(","))
+    return () if delays == (0,) else delays
+
+def open_cli_file(path, mode):
+    """Open path for --import/--export, with '-' meaning stdin/stdout"""
+    if path == "-":
+        return open(sys.stdin.fileno() if 'r' in mode else sys.stdout.fileno(), mode, closefd=False, newline="")
+    return open(path, mode, newline="")
+
+def cli_import_export(app, args):
+    path = args.import_file or args.export_file
+    fmt = args.format or guess_format(path)
+    if fmt not in IMPORT_FORMATS:
+        print(f"Cannot tell the format of {path}, use --format", file=sys.stderr)
+        return 2
+    
+    if args.import_file:
+        skipped = []
+        
+        def valid_records(records):
+            for number, record in enumerate(records, 1):
+                try:
+                    yield normalize_reminder(record)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    skipped.append(number)
+                    print(f"Skipping record {number}: {e}", file=sys.stderr)
+        
+        with open_cli_file(path, 'r') as f:
+            count = app.add_reminders(valid_records(IMPORT_FORMATS[fmt](f)), args.reminder_list)
+        print(f"Imported {count} reminders ({len(skipped)} skipped)", file=sys.stderr)
+    else:
+        with open_cli_file(path, 'w') as f:
+            for chunk in EXPORT_FORMATS[fmt](app.iter_reminders(args.reminder_list)):
+                f.write(chunk)
+    return 0
+
+def cli_list(app, args):
+    if isinstance(app, ReminderClient):
+        reminders = app.request('list', list=args.reminder_list)['reminders']
+    else:
+        reminders = app.open_list(args.reminder_list).reminders.values()
+    
+    pending = sorted((r for r in reminders if not r['triggered']), key=lambda r: r['trigger_time'])
+    for reminder in pending:
+        repeat = f"  [{reminder['recurrence']}]" if reminder.get('recurrence') else ""
+        print(f"{reminder['id']:>10}  {format_trigger_time(reminder['trigger_time'])}  "
+              f"{reminder['title']}{repeat}")
+    if not pending:
+        print("No pending reminders")
+    return 0
+
+def cli_add(app, args):
+    try:
+        if args.at:
+            trigger_time = parse_trigger_time(args.at)
+        else:
+            trigger_time = time.time() + parse_delay(args.delay or "5m")
+        if args.repeat and first_occurrence(args.repeat, trigger_time) is None:
+            raise ValueError(f"{args.repeat!r} never occurs after {format_trigger_time(trigger_time)}")
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    
+    reminder = app.add_reminder(args.add, args.message, trigger_time, args.repeat, args.reminder_list)
+    # A repeating reminder first comes due where its rule first matches
+    print(f"Added reminder {reminder['id']} due {format_trigger_time(reminder['trigger_time'])}")
+    return 0
+
+def cli_status(app, args):
+    if isinstance(app, ReminderClient):
+        status = app.status()
+        print(f"Background service running (pid {status['pid']}, {status.get('lists', 1)} lists loaded)")
+    else:
+        status = {
+            'reminders': len(app.reminders),
+            'pending': len(app.scheduler),
+            'next_due': app.scheduler.next_due_time(),
+        }
+        print("Background service not running")
+    
+    print(f"{status['pending']} pending of {status['reminders']} reminders in memory")
+    if status['next_due'] is not None:
+        print(f"Next due {format_trigger_time(status['next_due'])}")
+    if 'notifications' in status:
+        counters = status['notifications']
+        print(f"Notifications: {counters['queued']} queued, {counters['sent']} sent, "
+              f"{counters['coalesced']} coalesced, {counters['dropped']} dropped, {counters.get('failed', 0)} failed")
+    if status.get('writes'):
+        counters = status['writes']
+        print(f"Store: {counters['changes']} changes in {counters['writes']} writes, "
+              f"{counters['avoided']} writes avoided")
+    return 0
+
+def notify_options(args):
+    """NotificationDispatcher settings from the command line"""
+    return {
+        'window': args.notify_window,
+        'rate': args.notify_rate,
+        'max_queue': args.notify_queue,
+        'overflow': args.notify_overflow,
+    }
+
+def app_options(args):
+    """Settings of the process owning the reminders, from the command line"""
+    return {
+        'storage': args.storage,
+        'notify_options': notify_options(args),
+        'catch_up': args.catch_up,
+        'archive_after': args.archive_after * 86400 if args.archive_after > 0 else None,
+        'write_delay': max(0, args.write_delay),
+        'on_conflict': args.on_conflict,
+        'metrics_port': args.metrics_port,
+        'metrics_file': args.metrics_file,
+        'reminder_list': args.reminder_list,
+        'escalation': args.escalate,
+    }
+
+def run_cli(args):
+    """Handle the one-shot command line options without loading GTK"""
+    if args.import_file or args.export_file:
+        command = cli_import_export
+    elif args.add:
+        command = cli_add
+    elif args.list:
+        command = cli_list
     else:
-        app = BackgroundReminderApp()
+        command = cli_status
+    
+    try:
+        ReminderList.directory_for(default_config_dir(), args.reminder_list)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    
+    # Goes through the background service when one is running
+    try:
+        app = open_reminders(serve=False, start_checker=False, storage=args.storage, reminder_list=args.reminder_list)
+    except OSError as e:
+        print(f"Error: cannot reach the reminder service: {e}", file=sys.stderr)
+        return 1
+    try:
+        return command(app, args)
+    except (OSError, ReminderServiceError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        app.shutdown()
+
+def main(argv=None):
+    args, remaining_args = build_parser().parse_known_args(argv)
+    
+    if args.import_file or args.export_file or args.add or args.list or args.status:
+        return run_cli(args)
+    
+    if args.background and not args.show_ui:
+        app = BackgroundReminderApp(**app_options(args))
         app.run()
         return 0
+    
+    _, ReminderApp = gui_classes()
+    app = ReminderApp(**app_options(args))
+    # argparse has already consumed our own options
+    return app.run(sys.argv[:1] + remaining_args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())